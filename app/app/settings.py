@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,17 +83,67 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# core.db is the PostgreSQL backend with connection health checks and a bounded
+# in-process pool. DB_CONN_MAX_AGE keeps a connection per thread open for that
+# many seconds (0 closes it after every request). DB_POOL_SIZE above 0 hands
+# closed connections back to a pool of at most that many connections per
+# process instead of closing them, waiting up to DB_POOL_TIMEOUT seconds for a
+# free one. Keep the pool size times the number of processes below the
+# server's max_connections.
+
 DATABASES = {
     'default': {
-        'ENGINE': "django.db.backends.postgresql",
+        'ENGINE': "core.db",
         'HOST': os.environ.get("DB_HOST"),
         'NAME': os.environ.get("DB_NAME"),
         'USER': os.environ.get("DB_USER"),
         'PASSWORD': os.environ.get("DB_PASS"),
+        'CONN_MAX_AGE': int(os.environ.get("DB_CONN_MAX_AGE", 0)),
+        'CONN_HEALTH_CHECKS': os.environ.get("DB_CONN_HEALTH_CHECKS", "1") == "1",
+        'POOL': {
+            'SIZE': int(os.environ.get("DB_POOL_SIZE", 0)),
+            'TIMEOUT': float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The local memory cache is per process. Point CACHE_BACKEND and CACHE_LOCATION
+# to a shared cache (e.g. memcached) when running several workers, otherwise
+# cached responses are only invalidated in the worker that handled the write.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    # Login and sign-up throttling state, deliberately local to each process
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+    },
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# PBKDF2 iterations are set by PASSWORD_HASH_ITERATIONS. Stored hashes with a
+# different count are rehashed the next time their user logs in.
+
+PASSWORD_HASHING = {
+    'PBKDF2_ITERATIONS': int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000)),
+}
+
+PASSWORD_HASHERS = [
+    'user.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -132,6 +186,82 @@ MEDIA_URL = '/static/media/'
 STATIC_ROOT = '/vol/web/static/'
 MEDIA_ROOT = '/vol/web/media/'
 
+# Resized copies generated in the background for every uploaded recipe image,
+# WORKERS 0 generates them in the request instead
+RECIPE_IMAGE_DERIVATIVES = {
+    'SIZES': {'thumbnail': 160, 'medium': 640},
+    'QUALITY': 80,
+    'WORKERS': int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', 2)),
+}
+
+# Limits of recipe image uploads, checked while the upload streams in.
+# HEADER_BYTES is how much of a file may arrive before its dimensions must be known
+RECIPE_IMAGE_UPLOAD = {
+    'MAX_BYTES': int(os.environ.get('IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)),
+    'MAX_PIXELS': int(os.environ.get('IMAGE_UPLOAD_MAX_PIXELS', 40_000_000)),
+    'HEADER_BYTES': 1024 * 1024,
+}
+
+# Rows of a recipe bulk import are validated and inserted CHUNK_SIZE at a time
+RECIPE_BULK_IMPORT = {
+    'CHUNK_SIZE': int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', 500)),
+    'MAX_ROWS': int(os.environ.get('BULK_IMPORT_MAX_ROWS', 10000)),
+}
+
+# Recipe exports are read from a server-side cursor CHUNK_SIZE rows at a time
+RECIPE_EXPORT = {
+    'CHUNK_SIZE': int(os.environ.get('EXPORT_CHUNK_SIZE', 1000)),
+}
+
+# Request timing
+# core.middleware.RequestTimingMiddleware sends a Server-Timing header with the
+# SQL, serializer, view, render and total time of each request and logs slow
+# requests, slow queries and queries repeated DUPLICATE_QUERY_THRESHOLD times in
+# one request.
+
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING', '1') == '1',
+    'SERVER_TIMING': os.environ.get('SERVER_TIMING_HEADER', '1') == '1',
+    'SLOW_REQUEST_MS': float(os.environ.get('SLOW_REQUEST_MS', 500)),
+    'SLOW_QUERY_MS': float(os.environ.get('SLOW_QUERY_MS', 100)),
+    'DUPLICATE_QUERY_THRESHOLD': int(os.environ.get('DUPLICATE_QUERY_THRESHOLD', 5)),
+}
+
+# Metrics
+# Every worker process writes its metrics to a file in DIR at most once every
+# FLUSH_INTERVAL seconds, /internal/metrics/ merges them for the clients in
+# ALLOWED_IPS. REMOTE_ADDR is used as is, so scrape the workers directly
+# rather than through the load balancer.
+
+METRICS = {
+    'ENABLED': os.environ.get('METRICS', '1') == '1',
+    'DIR': os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'recipe-app-metrics')),
+    'FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', 5)),
+    'ALLOWED_IPS': [
+        ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()
+    ],
+}
+
+# Token bucket throttling of user:token and user:create per client address.
+# A client may send CAPACITY requests at once, after which the bucket refills
+# by RATE requests per second. Requests over the limit are rejected with 429
+# before any password is hashed.
+
+USER_THROTTLE = {
+    'ENABLED': os.environ.get('USER_THROTTLE', '1') == '1',
+    'CACHE': 'throttle',
+    'SCOPES': {
+        'user:token': {
+            'CAPACITY': int(os.environ.get('TOKEN_THROTTLE_CAPACITY', 10)),
+            'RATE': float(os.environ.get('TOKEN_THROTTLE_RATE', 0.2)),
+        },
+        'user:create': {
+            'CAPACITY': int(os.environ.get('CREATE_USER_THROTTLE_CAPACITY', 5)),
+            'RATE': float(os.environ.get('CREATE_USER_THROTTLE_RATE', 0.05)),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -144,8 +274,64 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # orjson backed JSON, rest_framework.renderers.JSONRenderer and
+    # rest_framework.parsers.JSONParser are drop-in replacements
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
+    # Throttles identify clients by REMOTE_ADDR. Behind NUM_PROXIES trusted reverse
+    # proxies they use the client address those proxies append to X-Forwarded-For
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
+# Token authentication cache: in-process LRU with an optional shared cache tier.
+# Other processes only notice revoked tokens once their local entry expires,
+# so keep TTL short when running several workers.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_CACHE_TTL', 30)),
+    'SHARED_CACHE': os.environ.get('TOKEN_CACHE_ALIAS') or None,
+    'SHARED_TTL': int(os.environ.get('TOKEN_CACHE_SHARED_TTL', 300)),
+}
+
+# Cached list responses of recipes, tags and ingredients, TIMEOUT 0 disables caching.
+# Writes invalidate them through a counter in the same cache, which a process
+# local backend cannot share between workers, so caching is on by default only
+# when ALIAS names a shared cache.
+RESPONSE_CACHE = {
+    'ALIAS': os.environ.get('RESPONSE_CACHE_ALIAS', 'default'),
+}
+RESPONSE_CACHE['TIMEOUT'] = int(os.environ.get(
+    'RESPONSE_CACHE_TIMEOUT',
+    0 if CACHES[RESPONSE_CACHE['ALIAS']]['BACKEND'] in (
+        'django.core.cache.backends.locmem.LocMemCache',
+        'django.core.cache.backends.dummy.DummyCache',
+    ) else 300,
+))
+
+# Tag and ingredient typeahead: default and largest number of matches, and how
+# long clients may reuse a response without asking again
+TYPEAHEAD = {
+    'LIMIT': int(os.environ.get('TYPEAHEAD_LIMIT', 10)),
+    'MAX_LIMIT': int(os.environ.get('TYPEAHEAD_MAX_LIMIT', 50)),
+    'MAX_AGE': int(os.environ.get('TYPEAHEAD_MAX_AGE', 30)),
+}
+
+# Build recipe, tag and ingredient lists from values() rows instead of serializer
+# instances where the serializer allows it, the output is the same
+FAST_LIST_SERIALIZATION = os.environ.get('FAST_LIST_SERIALIZATION', '0') == '1'
+
+# Upper bound for the page_size query parameter
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
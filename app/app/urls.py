@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from core.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,6 +26,7 @@ urlpatterns = [
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
     path('api/user/', include('user.urls'), name='user'),
     path('api/recipe/', include('recipe.urls'), name='recipe'),
+    path('internal/metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,11 @@
+"""
+PostgreSQL backend with health checked persistent connections and an optional
+bounded connection pool
+
+Use it with ENGINE 'core.db'. Besides the usual keys the database settings read
+
+    CONN_HEALTH_CHECKS  check a reused connection before the first query of a
+                        request and on checkout from the pool
+    POOL                {'SIZE': ..., 'TIMEOUT': ...}, a SIZE of 0 disables
+                        the pool
+"""
@@ -0,0 +1,74 @@
+from django.db.backends.postgresql import base
+
+from core.db.creation import DatabaseCreation
+from core.db.pool import get_pool, record
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connection with health checks and an optional bounded pool"""
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.pool = None
+
+    @property
+    def health_checks_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict.get('POOL') or {}
+        self.health_check_done = True
+        if not options.get('SIZE'):
+            self.pool = None
+            connection = super().get_new_connection(conn_params)
+            record('connections_opened')
+            return connection
+
+        self.pool = get_pool(self.alias, conn_params, options['SIZE'], options.get('TIMEOUT', 10))
+        return self.pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            self._check if self.health_checks_enabled else None,
+        )
+
+    def _check(self, connection):
+        """Running a trivial query on a raw connection taken from the pool"""
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                # Autocommit can only be switched back on outside a transaction
+                connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.pool is None:
+            try:
+                super()._close()
+            finally:
+                record('connections_closed')
+        elif self.in_atomic_block:
+            # Django keeps a connection closed inside an atomic block around until
+            # the block exits, so it cannot be handed to another thread
+            with self.wrap_database_errors:
+                self.connection.close()
+            self.pool.release(self.connection)
+        else:
+            self.pool.release(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        """Closing the connection as Django does and checking a kept one before its next use"""
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if self.connection is not None and self.health_checks_enabled and not self.health_check_done:
+            if not self.in_atomic_block and not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
@@ -0,0 +1,19 @@
+from django.db.backends.postgresql import creation
+
+from core.db.pool import drain_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Test database creation closing leftover connections before dropping the database"""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        drain_pools()
+        # Persistent connections of worker threads (e.g. image derivatives) are
+        # only closed when those threads handle their next job
+        with self._nodb_cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_terminate_backend(pid) FROM pg_stat_activity '
+                'WHERE datname = %s AND pid <> pg_backend_pid()',
+                [test_database_name],
+            )
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,149 @@
+"""
+Bounded in-process pool of PostgreSQL connections
+
+A pool is shared by the threads of a process and never holds more than SIZE
+open connections. Threads asking for a connection while all of them are in use
+wait up to TIMEOUT seconds. Counters for connection churn and pool waits are
+kept per process and read with connection_stats().
+"""
+import threading
+import time
+from collections import Counter, deque
+
+from psycopg2 import Error, OperationalError, extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def connection_stats():
+    """Returning the connection counters of this process and the state of its pools"""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _pools_lock:
+        pools = list(_pools.values())
+    stats['pool_idle'] = sum(pool.idle for pool in pools)
+    stats['pool_in_use'] = sum(pool.in_use for pool in pools)
+    return stats
+
+
+def get_pool(alias, conn_params, size, timeout):
+    """Returning the pool of alias for conn_params, creating it on first use"""
+    key = (alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(size, timeout)
+        return _pools[key]
+
+
+def drain_pools():
+    """Closing the idle connections of every pool, e.g. before dropping a database"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.drain()
+
+
+def _close(connection):
+    try:
+        connection.close()
+    finally:
+        record('connections_closed')
+
+
+class ConnectionPool:
+    """Bounded set of open connections handed out to one thread at a time"""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.in_use = 0
+        # Idle connections are reused last in first out so rarely needed ones
+        # are the ones left to time out on the server
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self, connect, check=None):
+        """Returning an idle connection that passes check or a new one from connect"""
+        if not self._slots.acquire(blocking=False):
+            record('pool_waits')
+            start = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.timeout)
+            record('pool_wait_seconds', time.monotonic() - start)
+            if not acquired:
+                record('pool_timeouts')
+                raise OperationalError(
+                    f'No database connection available within {self.timeout} seconds, '
+                    f'all {self.size} connections of the pool are in use'
+                )
+        try:
+            connection = self._checkout(connect, check)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        record('pool_checkouts')
+        return connection
+
+    def _checkout(self, connect, check):
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = connect()
+                record('connections_opened')
+                return connection
+            if not connection.closed and (check is None or check(connection)):
+                return connection
+            record('pool_discarded')
+            _close(connection)
+
+    def release(self, connection):
+        """Returning connection to the pool, closing it when it cannot be reused"""
+        try:
+            if self._reset(connection):
+                with self._lock:
+                    self._idle.append(connection)
+            else:
+                record('pool_discarded')
+                _close(connection)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def _reset(self, connection):
+        """Rolling back an open transaction, False when the connection is broken"""
+        if connection.closed:
+            return False
+        try:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Error:
+            return False
+        return True
+
+    def drain(self):
+        """Closing every idle connection"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection in idle:
+            _close(connection)
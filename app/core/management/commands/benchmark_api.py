@@ -0,0 +1,204 @@
+"""
+Django Command driving the API in-process and reporting latency as JSON
+"""
+import json
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.seeding import DISHES, TAGS, create_users, seed_user
+
+# Scenarios return the method, URL and data of one request for a seeded user
+SCENARIOS = {
+    'recipe-list': lambda user, rng: ('get', reverse('recipe:recipe-list'), None),
+    'recipe-list-filtered': lambda user, rng: (
+        'get', reverse('recipe:recipe-list'),
+        {'tags': rng.choice(user['tag_ids']), 'ordering': 'time_minutes'},
+    ),
+    'recipe-search': lambda user, rng: ('get', reverse('recipe:recipe-list'), {'search': rng.choice(DISHES)}),
+    'recipe-detail': lambda user, rng: (
+        'get', reverse('recipe:recipe-detail', args=[rng.choice(user['recipe_ids'])]), None
+    ),
+    'tag-list': lambda user, rng: ('get', reverse('recipe:tag-list'), None),
+    'tag-typeahead': lambda user, rng: ('get', reverse('recipe:tag-typeahead'), {'q': rng.choice(TAGS)[:3]}),
+    'ingredient-list': lambda user, rng: ('get', reverse('recipe:ingredient-list'), None),
+    'user-me': lambda user, rng: ('get', reverse('user:me'), None),
+    'user-token': lambda user, rng: (
+        'post', reverse('user:token'), {'email': user['email'], 'password': user['password']}
+    ),
+}
+# Scenarios sending credentials in the body rather than a token
+ANONYMOUS = {'user-token'}
+
+
+def percentile(ordered, fraction):
+    """Returning the nearest rank percentile of sorted values"""
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the recipe, tag, ingredient and user endpoints at a given concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+        parser.add_argument('--warmup', type=int, default=5, help='Unrecorded requests per thread and scenario')
+        parser.add_argument('--prefix', help='Benchmark users created by seed_data instead of seeding new ones')
+        parser.add_argument('--password', default='password123')
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--no-response-cache', action='store_true')
+        parser.add_argument('--throttle', action='store_true', help='Keep login and sign-up throttling on')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='File to write the report to instead of stdout')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if prefix is None:
+            prefix = f'benchmark-{time.time_ns()}'
+            self._seed(prefix, options)
+        try:
+            users = self._users(prefix, options['password'])
+            if not users:
+                raise CommandError(f'No users named {prefix}-<n>@example.com, run seed_data first')
+            overrides = {'RESPONSE_CACHE': {'ALIAS': 'default', 'TIMEOUT': 0}} if options['no_response_cache'] else {}
+            if not options['throttle']:
+                # Every benchmark thread shares one client address
+                overrides['USER_THROTTLE'] = {**settings.USER_THROTTLE, 'ENABLED': False}
+            with override_settings(**overrides):
+                report = {
+                    'config': {
+                        name: options[name]
+                        for name in (
+                            'concurrency', 'requests', 'warmup', 'recipes', 'seed', 'no_response_cache', 'throttle',
+                        )
+                    },
+                    'scenarios': {name: self._run(name, users, options) for name in options['scenarios']},
+                }
+        finally:
+            if options['prefix'] is None:
+                get_user_model().objects.filter(email__startswith=f'{prefix}-').delete()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def _seed(self, prefix, options):
+        rng = random.Random(options['seed'])
+        for user in create_users(prefix, options['users'], options['password']):
+            seed_user(
+                user, rng, recipes=options['recipes'], tags=30, ingredients=60,
+                tags_per_recipe=3, ingredients_per_recipe=6,
+            )
+
+    def _users(self, prefix, password):
+        """Loading the token, tags and some recipes of every benchmark user"""
+        users = []
+        for user in get_user_model().objects.filter(email__startswith=f'{prefix}-').order_by('id'):
+            users.append({
+                'email': user.email,
+                'password': password,
+                'token': Token.objects.get_or_create(user=user)[0].key,
+                'tag_ids': list(Tag.objects.filter(user=user).values_list('id', flat=True)) or [0],
+                'recipe_ids': list(Recipe.objects.filter(user=user).values_list('id', flat=True)[:100]) or [0],
+            })
+        return users
+
+    def _run(self, name, users, options):
+        """Sending the requests of one scenario from concurrent threads"""
+        concurrency = max(1, options['concurrency'])
+        shares = [options['requests'] // concurrency + (i < options['requests'] % concurrency)
+                  for i in range(concurrency)]
+        results = [[] for _ in range(concurrency)]
+        barrier = threading.Barrier(concurrency + 1)
+        threads = [
+            threading.Thread(
+                target=self._worker, args=(name, users, shares[i], options, options['seed'] + i, barrier, results[i])
+            )
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        # Every thread is warmed up when the clock starts
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            for thread in threads:
+                thread.join()
+            raise CommandError(f'A thread of the {name} scenario failed while warming up')
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return self._summary([result for thread_results in results for result in thread_results], elapsed)
+
+    def _worker(self, name, users, count, options, seed, barrier, results):
+        rng = random.Random(seed)
+        client = APIClient(SERVER_NAME=self._host(), raise_request_exception=False)
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def send():
+            user = rng.choice(users)
+            method, url, data = SCENARIOS[name](user, rng)
+            client.credentials(**({} if name in ANONYMOUS else {'HTTP_AUTHORIZATION': f'Token {user["token"]}'}))
+            queries[0] = 0
+            start = time.perf_counter()
+            with connection.execute_wrapper(count_query):
+                response = getattr(client, method)(url, data)
+            return time.perf_counter() - start, queries[0], response.status_code
+
+        try:
+            try:
+                for _ in range(options['warmup']):
+                    send()
+            except BaseException:
+                barrier.abort()
+                raise
+            barrier.wait()
+            for _ in range(count):
+                results.append(send())
+        finally:
+            connection.close()
+
+    def _host(self):
+        """Returning a host name accepted by ALLOWED_HOSTS"""
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+        return hosts[0] if hosts else 'localhost'
+
+    def _summary(self, results, elapsed):
+        """Reporting throughput, latency percentiles in milliseconds and queries per request"""
+        latencies = sorted(latency * 1000 for latency, _, _ in results)
+        queries = [count for _, count, _ in results]
+        summary = {
+            'requests': len(results),
+            'errors': sum(status >= 400 for _, _, status in results),
+            'throughput_rps': round(len(results) / elapsed, 1) if elapsed else None,
+        }
+        if results:
+            summary['latency_ms'] = {
+                'mean': round(statistics.mean(latencies), 2),
+                **{f'p{int(fraction * 100)}': round(percentile(latencies, fraction), 2)
+                   for fraction in (0.5, 0.9, 0.95, 0.99)},
+                'max': round(latencies[-1], 2),
+            }
+            summary['queries_per_request'] = {'mean': round(statistics.mean(queries), 2), 'max': max(queries)}
+        return summary
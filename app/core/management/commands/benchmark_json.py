@@ -0,0 +1,84 @@
+"""
+Django Command comparing DRF's JSON renderer and parser with the orjson backed ones
+"""
+import io
+import random
+import statistics
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.management import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from core import renderers
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'Times rendering and parsing a large recipe list with the stdlib and orjson backed classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--tags-per-recipe', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, both variants use the stdlib'))
+
+        data = self._recipes(random.Random(options['seed']), options)
+        body = JSONRenderer().render(data)
+        self.stdout.write(f'{options["recipes"]} recipes, {len(body) / 1024:.0f} KiB of JSON')
+        if FastJSONRenderer().render(data) != body:
+            self.stdout.write(self.style.ERROR('Rendered output differs from JSONRenderer'))
+
+        context = {'encoding': 'utf-8'}
+        variants = (
+            ('render', 'JSONRenderer', lambda: JSONRenderer().render(data)),
+            ('render', 'FastJSONRenderer', lambda: FastJSONRenderer().render(data)),
+            ('parse', 'JSONParser', lambda: JSONParser().parse(io.BytesIO(body), None, context)),
+            ('parse', 'FastJSONParser', lambda: FastJSONParser().parse(io.BytesIO(body), None, context)),
+        )
+        medians = {}
+        for operation, label, run in variants:
+            timings = self._time(run, options['repeat'])
+            medians[label] = statistics.median(timings)
+            self.stdout.write(
+                f'{operation} {label}: median {medians[label]:.2f} ms, '
+                f'max {max(timings):.2f} ms over {len(timings)} runs'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: render {medians["JSONRenderer"] / medians["FastJSONRenderer"]:.1f}x, '
+            f'parse {medians["JSONParser"] / medians["FastJSONParser"]:.1f}x'
+        ))
+
+    def _recipes(self, rng, options):
+        """Building a list shaped like the output of the recipe serializers"""
+        tags = [OrderedDict(id=i, name=f'Tag {i}') for i in range(50)]
+        return ReturnList((
+            OrderedDict(
+                id=i,
+                name=f'Recipe {i} – crème brûlée',
+                tags=rng.sample(tags, options['tags_per_recipe']),
+                ingredients=rng.sample(tags, options['tags_per_recipe']),
+                time_minutes=rng.randint(5, 120),
+                link=f'https://example.com/recipes/{i}',
+                description='Mix everything and bake. ' * rng.randint(1, 10),
+                price=str(Decimal(rng.randint(100, 9999)) / 100),
+            )
+            for i in range(options['recipes'])
+        ), serializer=None)
+
+    def _time(self, run, repeat):
+        """Returning run durations in milliseconds"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
@@ -0,0 +1,95 @@
+"""
+Django Command comparing DISTINCT joins with EXISTS subqueries for recipe filters
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from core.models import Recipe, Tag
+from core.seeding import seed_user
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded dataset"""
+
+
+class Command(BaseCommand):
+    help = 'Seeds a dataset inside a rolled back transaction and compares recipe filter plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--tags-per-recipe', type=int, default=5)
+        parser.add_argument('--filter-tags', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, **options):
+        """Seeding, analyzing and timing both variants of each filter"""
+        rng = random.Random(options['seed'])
+        user = self._seed(rng, options)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'ANALYZE core_recipe, core_tag, core_ingredient, core_recipe_tags, core_recipe_ingredients'
+            )
+
+        tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True)[:options['filter_tags']])
+        recipes = Recipe.objects.filter(user=user).order_by('-id')
+        tags = Tag.objects.filter(user=user).order_by('-id')
+        variants = (
+            (
+                'recipes filtered by tags',
+                recipes.filter(tags__id__in=tag_ids).distinct(),
+                recipes.filter(Exists(
+                    Recipe.tags.through.objects.filter(recipe=OuterRef('pk'), tag__in=tag_ids)
+                )),
+            ),
+            (
+                'tags assigned to recipes',
+                tags.filter(recipe__isnull=False).distinct(),
+                tags.filter(Exists(Recipe.tags.through.objects.filter(tag=OuterRef('pk')))),
+            ),
+        )
+        for title, distinct, exists in variants:
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            for label, queryset in (('DISTINCT', distinct), ('EXISTS', exists)):
+                page = queryset[:options['page_size']]
+                self.stdout.write(self.style.MIGRATE_LABEL(f'{label} plan:'))
+                self.stdout.write(page.explain(analyze=True))
+                timings = self._time(lambda: list(page.all()), options['repeat'])
+                self.stdout.write(
+                    f'{label}: median {statistics.median(timings):.2f} ms, '
+                    f'max {max(timings):.2f} ms over {len(timings)} runs\n'
+                )
+
+    def _seed(self, rng, options):
+        """Creating a user with recipes linked to random tags and ingredients"""
+        user = get_user_model().objects.create_user(email=f'benchmark-{time.time_ns()}@example.com')
+        seed_user(
+            user, rng, recipes=options['recipes'], tags=options['tags'], ingredients=options['tags'],
+            tags_per_recipe=options['tags_per_recipe'], ingredients_per_recipe=options['tags_per_recipe'],
+        )
+        return user
+
+    def _time(self, run, repeat):
+        """Returning run durations in milliseconds"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
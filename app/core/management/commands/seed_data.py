@@ -0,0 +1,46 @@
+"""
+Django Command seeding users with synthetic recipes, tags and ingredients
+"""
+import json
+import random
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from core.seeding import create_users, seed_user
+
+
+class Command(BaseCommand):
+    help = 'Bulk creates users with realistic recipes, tags and ingredients for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=200, help='Recipes per user')
+        parser.add_argument('--tags', type=int, default=30, help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=60, help='Ingredients per user')
+        parser.add_argument('--tags-per-recipe', type=float, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=float, default=6)
+        parser.add_argument('--prefix', default='seed', help='Users are named <prefix>-<n>@example.com')
+        parser.add_argument('--password', default='password123')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = create_users(options['prefix'], options['users'], options['password'])
+            recipes = sum(
+                len(seed_user(
+                    user, rng, recipes=options['recipes'], tags=options['tags'], ingredients=options['ingredients'],
+                    tags_per_recipe=options['tags_per_recipe'],
+                    ingredients_per_recipe=options['ingredients_per_recipe'],
+                ))
+                for user in users
+            )
+        self.stdout.write(json.dumps({
+            'users': len(users),
+            'emails': f'{options["prefix"]}-<n>@example.com',
+            'recipes': recipes,
+            'seconds': round(time.perf_counter() - start, 3),
+        }))
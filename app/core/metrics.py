@@ -0,0 +1,239 @@
+"""
+Metrics in the Prometheus text exposition format
+
+Metrics are kept in memory by every process and written as a snapshot to a
+file named after the process id in METRICS['DIR'], at most once every
+FLUSH_INTERVAL seconds. The metrics view merges the files of all processes:
+counters and histograms are summed, gauges only count while their process is
+alive. Clear the directory when the service is deployed, as Prometheus does
+with restarted counters.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from core.db.pool import connection_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = tuple(2 ** power for power in range(14, 25, 2))
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_lock = threading.Lock()
+# Held while the snapshot of this process is written
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+class Metric:
+    """Values of one metric by label values"""
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+
+class Counter(Metric):
+    """Metric: Value only going up"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Metric: Observations counted in buckets, with their sum and count"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            # Bucket counts are kept per bucket and made cumulative when exposed
+            counts = self.values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            counts[next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))] += 1
+            counts[-1] += value
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling requests', ('route', 'method', 'status')
+)
+DB_QUERIES = Counter('http_request_db_queries_total', 'Database queries run by requests', ('route',))
+DB_TIME = Counter('http_request_db_seconds_total', 'Time requests spent in database queries', ('route',))
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+UPLOAD_SIZE = Histogram('upload_size_bytes', 'Size of accepted image uploads', buckets=SIZE_BUCKETS)
+UPLOADS_REJECTED = Counter('upload_rejected_total', 'Image uploads rejected while streaming', ('reason',))
+THROTTLED_REQUESTS = Counter('throttled_requests_total', 'Requests rejected by a token bucket', ('scope',))
+
+# Connection counters of core.db.pool, read when a snapshot is taken
+CONNECTION_METRICS = (
+    ('connections_opened', 'db_connections_opened_total', 'counter', 'Database connections opened'),
+    ('connections_closed', 'db_connections_closed_total', 'counter', 'Database connections closed'),
+    ('pool_checkouts', 'db_pool_checkouts_total', 'counter', 'Connections handed out by the pool'),
+    ('pool_waits', 'db_pool_waits_total', 'counter', 'Checkouts that waited for a free connection'),
+    ('pool_wait_seconds', 'db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a free connection'),
+    ('pool_timeouts', 'db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting'),
+    ('pool_discarded', 'db_pool_discarded_total', 'counter', 'Broken connections closed by the pool'),
+    ('pool_idle', 'db_pool_idle_connections', 'gauge', 'Open connections waiting in the pool'),
+    ('pool_in_use', 'db_pool_in_use_connections', 'gauge', 'Pooled connections in use'),
+)
+
+
+def snapshot():
+    """Returning the metrics of this process"""
+    with _lock:
+        metrics = {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in _registry.items()
+        }
+    stats = connection_stats()
+    for stat, name, _, _ in CONNECTION_METRICS:
+        metrics[name] = [[[], stats.get(stat, 0)]]
+    return {'pid': os.getpid(), 'metrics': metrics}
+
+
+def flush(force=False):
+    """Writing the snapshot of this process, at most once every FLUSH_INTERVAL seconds
+
+    Requests skip the flush while another thread is writing, forced flushes
+    wait for it. Write errors are logged, they never fail the caller.
+    """
+    global _last_flush
+    if not force and time.monotonic() - _last_flush < settings.METRICS['FLUSH_INTERVAL']:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        now = time.monotonic()
+        if not force and now - _last_flush < settings.METRICS['FLUSH_INTERVAL']:
+            return
+        _last_flush = now
+        directory = settings.METRICS['DIR']
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        # Readers never see a partly written file
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, 'w') as file:
+                json.dump(snapshot(), file)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning('Writing metrics to %s failed', path, exc_info=True)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    finally:
+        _flush_lock.release()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _snapshots():
+    directory = settings.METRICS['DIR']
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as file:
+                yield json.load(file)
+        except (OSError, ValueError):
+            continue
+
+
+def collect():
+    """Merging the snapshots of all processes into {name: {label values: value}}"""
+    flush(force=True)
+    types = {name: metric.type for name, metric in _registry.items()}
+    types.update((name, metric_type) for _, name, metric_type, _ in CONNECTION_METRICS)
+    merged = {name: {} for name in types}
+    for data in _snapshots():
+        alive = None
+        for name, series in data['metrics'].items():
+            if name not in types:
+                continue
+            if types[name] == 'gauge':
+                alive = _alive(data['pid']) if alive is None else alive
+                if not alive:
+                    continue
+            for key, value in series:
+                key = tuple(key)
+                current = merged[name].get(key)
+                if current is None:
+                    merged[name][key] = value
+                elif isinstance(value, list):
+                    merged[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[name][key] = current + value
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Rendering the merged metrics in the text exposition format"""
+    merged = collect()
+    lines = []
+    definitions = [(metric.name, metric.type, metric.documentation, metric) for metric in _registry.values()]
+    definitions += [(name, metric_type, doc, None) for _, name, metric_type, doc in CONNECTION_METRICS]
+    for name, metric_type, documentation, metric in definitions:
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        labels = metric.labels if metric else ()
+        for key, value in sorted(merged[name].items()):
+            if metric_type != 'histogram':
+                lines.append(f'{name}{_labels(labels, key)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, math.inf), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, key, [("le", _number(float(bound)))])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels, key)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(labels, key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    """Forgetting the metrics of this process"""
+    with _lock:
+        for metric in _registry.values():
+            metric.values.clear()
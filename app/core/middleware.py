@@ -0,0 +1,196 @@
+"""
+Request timing middleware
+
+Every request is measured with a database execute wrapper: the number of
+queries and time spent in SQL, the time spent building serializer output
+outside of SQL, the rest of the view (permissions, querysets, pagination),
+the time spent rendering the response and the total. Serializer output is
+timed where a top level serializer computes its data, nested serializers are
+part of it. The timings are sent in a Server-Timing header and kept on
+request.timing for other consumers.
+
+Slow requests, slow queries and queries repeated within one request (usually
+a missing select_related or prefetch_related) are logged with their SQL
+normalized, so literals and the length of IN lists do not split them.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.serializers import BaseSerializer
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Timing of the request handled by the current thread, if it is measured
+_current_timing = ContextVar('request_timing', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql):
+    """Replacing literals and IN lists of sql with placeholders"""
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _LITERALS.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class RequestTiming:
+    """Timings of one request, in seconds"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = Counter()
+        self.query_count = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.view = 0.0
+        self.render = 0.0
+        self.total = 0.0
+        self._render_start = None
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute wrapper counting and timing every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.db += duration
+            self.query_count += 1
+            self.queries[sql] += 1
+            if duration * 1000 >= settings.REQUEST_TIMING['SLOW_QUERY_MS']:
+                logger.warning('Slow query (%.1f ms): %s', duration * 1000, normalize_sql(sql))
+
+    @contextmanager
+    def serializing(self):
+        """Adding the time of the block outside of SQL to the serializer time"""
+        if self._serializing:
+            # Serializers whose data is read while serializing are already timed
+            yield
+            return
+        self._serializing = True
+        start, db = time.perf_counter(), self.db
+        try:
+            yield
+        finally:
+            self._serializing = False
+            self.serializer += time.perf_counter() - start - (self.db - db)
+
+    def duplicates(self, threshold):
+        """Returning normalized queries run at least threshold times"""
+        counts = Counter()
+        for sql, count in self.queries.items():
+            counts[normalize_sql(sql)] += count
+        return {sql: count for sql, count in counts.items() if count >= threshold}
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db * 1000:.1f};desc="{self.query_count} queries"',
+            f'serializer;dur={self.serializer * 1000:.1f}',
+            f'view;dur={self.view * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+
+def time_serializers():
+    """Wrapping BaseSerializer.data so top level serializer output of measured requests is timed"""
+    data = BaseSerializer.data.fget
+
+    def timed_data(serializer):
+        timing = _current_timing.get()
+        if timing is None:
+            return data(serializer)
+        with timing.serializing():
+            return data(serializer)
+
+    BaseSerializer.data = property(timed_data)
+
+
+class RequestTimingMiddleware:
+    """Middleware: Measuring SQL, serializer, view, render and total time of every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = settings.REQUEST_TIMING
+        if not options['ENABLED']:
+            return self.get_response(request)
+
+        timing = request.timing = RequestTiming()
+        token = _current_timing.set(timing)
+        try:
+            with connection.execute_wrapper(timing):
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        timing.total = time.perf_counter() - timing.start
+        if timing._render_start is None:
+            # Plain responses have no render step, all of their time is the view's
+            timing.view = timing.total - timing.db - timing.serializer
+        else:
+            timing.view = timing._render_start - timing.start - timing.db - timing.serializer
+
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = timing.server_timing()
+        self._log(request, response, timing, options)
+        return response
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, 'timing', None)
+        if timing is not None:
+            timing._render_start = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._rendered(timing))
+        return response
+
+    def _rendered(self, timing):
+        timing.render = time.perf_counter() - timing._render_start
+
+    def _log(self, request, response, timing, options):
+        if timing.total * 1000 >= options['SLOW_REQUEST_MS']:
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms total, %d queries in %.1f ms, serializer %.1f ms, '
+                'view %.1f ms, render %.1f ms',
+                request.method, request.path, response.status_code, timing.total * 1000,
+                timing.query_count, timing.db * 1000, timing.serializer * 1000, timing.view * 1000,
+                timing.render * 1000,
+            )
+        if timing.query_count >= options['DUPLICATE_QUERY_THRESHOLD']:
+            for sql, count in timing.duplicates(options['DUPLICATE_QUERY_THRESHOLD']).items():
+                logger.warning('Query repeated %d times in %s %s: %s', count, request.method, request.path, sql)
+
+
+class MetricsMiddleware:
+    """Middleware: Recording latency and queries of every request by route"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        metrics.REQUEST_DURATION.observe(
+            time.perf_counter() - start, route=route, method=request.method, status=response.status_code
+        )
+        timing = getattr(request, 'timing', None)
+        if timing is not None:
+            metrics.DB_QUERIES.inc(timing.query_count, route=route)
+            metrics.DB_TIME.inc(timing.db, route=route)
+        metrics.flush()
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:35
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Relinking recipes to the oldest of same-named tags and ingredients and deleting the rest"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        field = model_name.lower()
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'), count=Count('id'),
+        ).filter(count__gt=1)
+        for duplicate in duplicates:
+            keep = duplicate['keep']
+            extra_ids = model.objects.filter(
+                user=duplicate['user'], name=duplicate['name'],
+            ).exclude(id=keep).values_list('id', flat=True)
+            for extra_id in extra_ids:
+                linked = through.objects.filter(**{field: keep}).values('recipe')
+                through.objects.filter(**{field: extra_id}).exclude(recipe__in=linked).update(**{field: keep})
+            model.objects.filter(id__in=list(extra_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:50
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+RELATIONS = (('tags', 'tag'), ('ingredients', 'ingredient'))
+
+REFRESH = """
+CREATE FUNCTION core_recipe_{column}_ids_refresh() RETURNS trigger AS $$
+BEGIN
+    -- Locking the recipes first lets the update below see links committed meanwhile
+    PERFORM 1 FROM core_recipe WHERE id IN (SELECT recipe_id FROM changed) ORDER BY id FOR UPDATE;
+    UPDATE core_recipe AS recipe SET {column}_ids = ARRAY(
+        SELECT link.{column}_id FROM core_recipe_{table} AS link
+        WHERE link.recipe_id = recipe.id ORDER BY link.{column}_id
+    )
+    WHERE recipe.id IN (SELECT recipe_id FROM changed);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_{table}_insert_trigger
+AFTER INSERT ON core_recipe_{table} REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_{column}_ids_refresh();
+
+CREATE TRIGGER core_recipe_{table}_delete_trigger
+AFTER DELETE ON core_recipe_{table} REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_{column}_ids_refresh();
+
+UPDATE core_recipe AS recipe SET {column}_ids = ARRAY(
+    SELECT link.{column}_id FROM core_recipe_{table} AS link
+    WHERE link.recipe_id = recipe.id ORDER BY link.{column}_id
+);
+"""
+
+DROP_REFRESH = """
+DROP TRIGGER core_recipe_{table}_insert_trigger ON core_recipe_{table};
+DROP TRIGGER core_recipe_{table}_delete_trigger ON core_recipe_{table};
+DROP FUNCTION core_recipe_{column}_ids_refresh();
+"""
+
+# Statements run directly against core_recipe (trigger depth 1), such as ORM saves
+# of instances loaded before a link changed, must not overwrite the arrays
+GUARD = """
+CREATE FUNCTION core_recipe_relation_ids_guard() RETURNS trigger AS $$
+BEGIN
+    IF pg_trigger_depth() = 1 THEN
+        IF TG_OP = 'INSERT' THEN
+            NEW.tag_ids := '{}';
+            NEW.ingredient_ids := '{}';
+        ELSE
+            NEW.tag_ids := OLD.tag_ids;
+            NEW.ingredient_ids := OLD.ingredient_ids;
+        END IF;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_relation_ids_guard_trigger
+BEFORE INSERT OR UPDATE OF tag_ids, ingredient_ids ON core_recipe
+FOR EACH ROW EXECUTE FUNCTION core_recipe_relation_ids_guard();
+"""
+
+DROP_GUARD = """
+DROP TRIGGER core_recipe_relation_ids_guard_trigger ON core_recipe;
+DROP FUNCTION core_recipe_relation_ids_guard();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_recipe_time_price_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None),
+        ),
+        *(migrations.RunSQL(REFRESH.format(table=table, column=column), DROP_REFRESH.format(table=table, column=column))
+          for table, column in RELATIONS),
+        migrations.RunSQL(GUARD, DROP_GUARD),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='recipe_tag_ids_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='recipe_ingredient_ids_idx'),
+        ),
+    ]
@@ -3,6 +3,9 @@ Models for Database
 """
 
 from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
@@ -10,6 +13,9 @@ from app import settings
 import uuid
 import os
 
+# Text search configuration of the search_vector trigger of Recipe
+SEARCH_CONFIG = 'english'
+
 
 def recipe_image_file_path(instance, filename):
     """Generate new file path for new recipe image"""
@@ -71,6 +77,23 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_derivatives = models.JSONField(default=dict, blank=True)
+    # Maintained by a database trigger from name (weight A) and description (weight B)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Sorted ids of linked tags and ingredients, maintained by database triggers on
+    # the through tables. Writes from the ORM to these columns are ignored
+    tag_ids = ArrayField(models.BigIntegerField(), default=list, editable=False)
+    ingredient_ids = ArrayField(models.BigIntegerField(), default=list, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_newest_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+            GinIndex(fields=['tag_ids'], name='recipe_tag_ids_idx'),
+            GinIndex(fields=['ingredient_ids'], name='recipe_ingredient_ids_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -81,6 +104,15 @@ class Tag(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='tag_user_newest_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='tag_name_trgm_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_tag_name_per_user'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -90,5 +122,14 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='ingredient_user_newest_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='ingredient_name_trgm_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_ingredient_name_per_user'),
+        ]
+
     def __str__(self):
         return self.name
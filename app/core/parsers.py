@@ -0,0 +1,43 @@
+"""
+JSON parser backed by orjson
+
+orjson is optional. Without it, and for documents orjson would read
+differently (invalid JSON, NaN and Infinity constants, integers over 64 bits
+that orjson turns into floats), parsing falls back to DRF's JSONParser so
+results and error messages stay the same.
+"""
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Checked on the raw body with substring searches, which are much faster than a
+# regular expression. Matches inside strings only cost the slower parser
+DIGITS_AS_ZEROS = bytes.maketrans(b'0123456789', b'0' * 10)
+LONG_INTEGER = b'0' * 19
+
+
+def _needs_stdlib(body):
+    return b'NaN' in body or b'Infinity' in body or LONG_INTEGER in body.translate(DIGITS_AS_ZEROS)
+
+
+class FastJSONParser(JSONParser):
+    """Parser: JSON decoded with orjson when it is installed"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if _needs_stdlib(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return orjson.loads(body if encoding.lower() in ('utf-8', 'utf8') else body.decode(encoding))
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
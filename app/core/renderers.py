@@ -0,0 +1,41 @@
+"""
+JSON renderer backed by orjson
+
+orjson is optional. Without it, and for output orjson cannot produce the
+same way (indented JSON, ASCII-only JSON, integers over 64 bits), rendering
+falls back to DRF's stdlib-based JSONRenderer. Floats in exponent notation
+are the one difference in output, e.g. 1e16 instead of 1e+16 for the same
+number.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Dates, times and dataclasses are left to DRF's encoder so they are written as before
+    ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Renderer: JSON encoded with orjson when it is installed"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escaped like JSONRenderer so the output stays a strict javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,87 @@
+"""
+Synthetic data for benchmarks
+
+Users get recipes, tags and ingredients with skewed distributions close to
+real data: a few tags and ingredients are used by most recipes, preparation
+times and prices are long tailed and the number of tags and ingredients per
+recipe varies around its mean. Everything is created with bulk inserts and
+drawn from the given random generator, so a seed reproduces a dataset.
+"""
+import math
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from core.models import Recipe, Tag, Ingredient
+
+DISHES = ('Curry', 'Soup', 'Salad', 'Stew', 'Pasta', 'Risotto', 'Tacos', 'Pie', 'Bowl', 'Stir fry', 'Bake')
+STYLES = ('Spicy', 'Creamy', 'Quick', 'Smoky', 'Lemon', 'Garlic', 'Summer', 'Winter', 'Green', 'Crispy')
+TAGS = ('Vegan', 'Vegetarian', 'Dinner', 'Lunch', 'Breakfast', 'Dessert', 'Quick', 'Gluten free', 'Spicy', 'Budget')
+INGREDIENTS = ('Salt', 'Olive oil', 'Garlic', 'Onion', 'Pepper', 'Butter', 'Rice', 'Tomato', 'Lemon', 'Tofu')
+DESCRIPTION = 'Chop the {0}, cook it with the {1} and season to taste. '
+
+
+def weighted_sample(rng, items, weights, count):
+    """Drawing count distinct items, each picked with a probability proportional to its weight"""
+    keys = [rng.random() ** (1 / weight) for weight in weights]
+    order = sorted(range(len(items)), key=keys.__getitem__, reverse=True)
+    return [items[index] for index in order[:count]]
+
+
+def _names(base, count):
+    """Returning count distinct names, cycling through base with a number once it runs out"""
+    return [base[i] if i < len(base) else f'{base[i % len(base)]} {i // len(base)}' for i in range(count)]
+
+
+def _around(rng, mean, limit):
+    """Returning a count varying around mean, between 0 and limit"""
+    if mean <= 0:
+        return 0
+    return max(1, min(limit, round(rng.gauss(mean, mean / 3))))
+
+
+def create_users(prefix, count, password=None):
+    """Bulk creating count users named prefix-<n>@example.com sharing one password hash"""
+    password = make_password(password)
+    return get_user_model().objects.bulk_create(
+        get_user_model()(email=f'{prefix}-{number}@example.com', name=f'{prefix} {number}', password=password)
+        for number in range(count)
+    )
+
+
+def seed_user(user, rng, recipes, tags, ingredients, tags_per_recipe, ingredients_per_recipe):
+    """Creating recipes of user linked to skewed picks of their tags and ingredients"""
+    user_tags = Tag.objects.bulk_create(Tag(user=user, name=name) for name in _names(TAGS, tags))
+    user_ingredients = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=name) for name in _names(INGREDIENTS, ingredients)
+    )
+    # Zipf like popularity, the first tags and ingredients are picked most often
+    tag_weights = [1 / (rank + 1) for rank in range(len(user_tags))]
+    ingredient_weights = [1 / (rank + 1) for rank in range(len(user_ingredients))]
+
+    user_recipes = Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            name=f'{rng.choice(STYLES)} {rng.choice(DISHES)} {number}',
+            time_minutes=max(1, min(600, round(rng.lognormvariate(math.log(30), 0.6)))),
+            price=Decimal(min(999.99, rng.lognormvariate(math.log(8), 0.5))).quantize(Decimal('0.01')),
+            description=DESCRIPTION.format(rng.choice(INGREDIENTS).lower(), rng.choice(INGREDIENTS).lower())
+            * rng.randint(1, 5),
+            link='' if rng.random() < 0.5 else f'https://example.com/recipes/{number}',
+        )
+        for number in range(recipes)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in user_recipes
+        for tag in weighted_sample(rng, user_tags, tag_weights, _around(rng, tags_per_recipe, len(user_tags)))
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(recipe=recipe, ingredient=ingredient)
+        for recipe in user_recipes
+        for ingredient in weighted_sample(
+            rng, user_ingredients, ingredient_weights, _around(rng, ingredients_per_recipe, len(user_ingredients))
+        )
+    )
+    return user_recipes
@@ -0,0 +1,65 @@
+"""
+Query budgets for API tests
+
+assertQueryBudget fails when a block runs more queries than its budget.
+assertQueriesScale runs a request against 1, 10 and 100 related rows and
+fails when the number of queries is over budget at any size or grows with
+the number of rows, the signature of an N+1. Failures list the SQL that ran.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test.utils import CaptureQueriesContext
+
+SCALES = (1, 10, 100)
+
+
+def format_queries(queries):
+    """Numbering captured queries for failure messages"""
+    return '\n'.join(f'{number}. {query["sql"]}' for number, query in enumerate(queries, start=1))
+
+
+class QueryBudgetMixin:
+    """Test: Assertions on the number of queries run by requests"""
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        """Failing when the block runs more than budget queries"""
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            self.fail(
+                f'{len(context)} queries run, the budget is {budget}:\n{format_queries(context.captured_queries)}'
+            )
+
+    def assertQueriesScale(self, setup, request, budget, scales=SCALES, using=DEFAULT_DB_ALIAS):
+        """Failing when request runs more than budget queries, or more queries for more rows
+
+        setup(size) creates size related rows and returns what request(state)
+        needs. Each size is set up and requested inside a transaction that is
+        rolled back, so the sizes do not see each other's rows.
+        """
+        captured = {}
+        for size in scales:
+            with transaction.atomic(using=using):
+                state = setup(size)
+                with CaptureQueriesContext(connections[using]) as context:
+                    request(state)
+                transaction.set_rollback(True, using=using)
+            captured[size] = context.captured_queries
+
+        counts = {size: len(queries) for size, queries in captured.items()}
+        smallest = scales[0]
+        grown = [size for size in scales if counts[size] > counts[smallest]]
+        if grown:
+            self.fail(
+                f'Queries grow with related rows {counts}. {grown[0]} rows ran:\n'
+                f'{format_queries(captured[grown[0]])}\n\n{smallest} rows ran:\n{format_queries(captured[smallest])}'
+            )
+        over = [size for size in scales if counts[size] > budget]
+        if over:
+            self.fail(
+                f'{counts[over[0]]} queries run for {over[0]} rows, the budget is {budget}:\n'
+                f'{format_queries(captured[over[0]])}'
+            )
+        return counts
@@ -1,6 +1,12 @@
-from django.test import SimpleTestCase
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase
 from django.core.management import call_command
 from unittest.mock import patch
+from io import StringIO
+
+from core.models import Recipe
 
 
 @patch('core.management.commands.wait_for_database.Command.check')
@@ -24,3 +30,61 @@ class CommandTests(SimpleTestCase):
     #     call_command('wait_for_database')
     #     self.assertEqual(6, patched_check.call_count)
     #     patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+
+    def test_benchmark_json(self):
+        """Test: JSON benchmark times both variants on identical output"""
+        out = StringIO()
+        call_command('benchmark_json', recipes=20, repeat=1, stdout=out)
+
+        self.assertIn('Speedup', out.getvalue())
+        self.assertNotIn('differs', out.getvalue())
+
+
+class SeedAndBenchmarkCommandTests(TransactionTestCase):
+
+    def test_seed_data(self):
+        """Test: Seeding creates users with recipes linked to their tags and ingredients"""
+        out = StringIO()
+        call_command('seed_data', users=2, recipes=10, tags=4, ingredients=5, prefix='test', stdout=out)
+
+        self.assertEqual(json.loads(out.getvalue())['recipes'], 20)
+        users = get_user_model().objects.filter(email__startswith='test-')
+        self.assertEqual(users.count(), 2)
+        for user in users:
+            self.assertTrue(user.check_password('password123'))
+            recipes = Recipe.objects.filter(user=user)
+            self.assertEqual(recipes.count(), 10)
+            self.assertTrue(all(recipe.tag_ids and recipe.ingredient_ids for recipe in recipes))
+            self.assertFalse(recipes.exclude(tags__user=user).filter(tags__isnull=False).exists())
+
+    def test_seed_data_reproducible(self):
+        """Test: The same seed creates the same recipes"""
+        runs = []
+        for prefix in ('first', 'second'):
+            call_command('seed_data', users=1, recipes=10, prefix=prefix, seed=3, stdout=StringIO())
+            runs.append(list(
+                Recipe.objects.filter(user__email__startswith=prefix)
+                .order_by('id').values_list('name', 'time_minutes', 'price', 'tag_ids__len')
+            ))
+
+        self.assertEqual(runs[0], runs[1])
+
+    def test_benchmark_api(self):
+        """Test: Benchmark reports every scenario without errors and removes its data"""
+        out = StringIO()
+        call_command(
+            'benchmark_api', users=2, recipes=5, requests=4, concurrency=2, warmup=1,
+            scenarios=['recipe-list', 'recipe-detail', 'tag-typeahead', 'user-me'], stdout=out,
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['config']['concurrency'], 2)
+        self.assertEqual(set(report['scenarios']), {'recipe-list', 'recipe-detail', 'tag-typeahead', 'user-me'})
+        for name, summary in report['scenarios'].items():
+            self.assertEqual((summary['requests'], summary['errors']), (4, 0), name)
+            self.assertLessEqual(summary['latency_ms']['p50'], summary['latency_ms']['max'])
+        self.assertGreater(report['scenarios']['recipe-detail']['queries_per_request']['mean'], 0)
+        self.assertFalse(get_user_model().objects.exists())
@@ -0,0 +1,121 @@
+"""
+Tests for the database backend with health checks and a connection pool
+"""
+from django.db import OperationalError, connection
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from django.test import TestCase
+
+from core.db.base import DatabaseWrapper
+from core.db.pool import connection_stats, drain_pools
+
+
+class DatabaseBackendTests(TestCase):
+    """Tests for pooled and health checked connections"""
+
+    def setUp(self):
+        self.wrappers = []
+        self.stats = connection_stats()
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        drain_pools()
+
+    def _wrapper(self, name, size=0, timeout=1, **settings):
+        """Connecting outside the test transaction, name keeps the pools of tests apart"""
+        settings_dict = {
+            **connection.settings_dict,
+            'OPTIONS': {'application_name': name},
+            'POOL': {'SIZE': size, 'TIMEOUT': timeout},
+            **settings,
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias=connection.alias)
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def _delta(self, name):
+        return connection_stats().get(name, 0) - self.stats.get(name, 0)
+
+    def _select_one(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            return cursor.fetchone()[0]
+
+    def test_unpooled_connection_churn(self):
+        """Test: Without a pool every connection is opened and closed"""
+        wrapper = self._wrapper('unpooled')
+        for _ in range(2):
+            self.assertEqual(self._select_one(wrapper), 1)
+            wrapper.close()
+
+        self.assertEqual(self._delta('connections_opened'), 2)
+        self.assertEqual(self._delta('connections_closed'), 2)
+
+    def test_pool_reuses_connection(self):
+        """Test: Closing a pooled connection keeps it open for the next checkout"""
+        wrapper = self._wrapper('pooled', size=2)
+        self._select_one(wrapper)
+        raw = wrapper.connection
+        wrapper.close()
+
+        self.assertEqual(self._select_one(wrapper), 1)
+        self.assertIs(wrapper.connection, raw)
+        self.assertEqual(self._delta('connections_opened'), 1)
+        self.assertEqual(self._delta('connections_closed'), 0)
+        self.assertEqual(self._delta('pool_checkouts'), 2)
+
+    def test_pool_rolls_back_open_transaction(self):
+        """Test: Connections returned inside a transaction are rolled back"""
+        wrapper = self._wrapper('rollback', size=1)
+        wrapper.ensure_connection()
+        wrapper.set_autocommit(False)
+        self._select_one(wrapper)
+        raw = wrapper.connection
+        wrapper.close()
+
+        self.assertEqual(raw.get_transaction_status(), TRANSACTION_STATUS_IDLE)
+        self.assertEqual(self._select_one(wrapper), 1)
+        self.assertIs(wrapper.connection, raw)
+        self.assertTrue(wrapper.get_autocommit())
+
+    def test_pool_is_bounded(self):
+        """Test: Waiting for a connection beyond the pool size times out"""
+        first = self._wrapper('bounded', size=1, timeout=0.05)
+        second = self._wrapper('bounded', size=1, timeout=0.05)
+        first.ensure_connection()
+
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+        self.assertEqual(self._delta('pool_waits'), 1)
+        self.assertEqual(self._delta('pool_timeouts'), 1)
+        self.assertGreater(self._delta('pool_wait_seconds'), 0)
+
+        first.close()
+        second.ensure_connection()
+        self.assertEqual(self._delta('connections_opened'), 1)
+
+    def test_pool_discards_broken_connection(self):
+        """Test: A closed idle connection is replaced on checkout"""
+        wrapper = self._wrapper('broken', size=1, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [raw.get_backend_pid()])
+
+        self.assertEqual(self._select_one(wrapper), 1)
+        self.assertIsNot(wrapper.connection, raw)
+        self.assertEqual(self._delta('pool_discarded'), 1)
+
+    def test_persistent_connection_health_check(self):
+        """Test: A persistent connection that broke between requests is reopened"""
+        wrapper = self._wrapper('persistent', CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIs(wrapper.connection, raw)
+
+        raw.close()
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertEqual(self._select_one(wrapper), 1)
+        self.assertIsNot(wrapper.connection, raw)
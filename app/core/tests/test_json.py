@@ -0,0 +1,102 @@
+"""
+Tests for the orjson backed renderer and parser
+"""
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+DATA = ReturnDict({
+    'price': Decimal('5.50'),
+    'created': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    'local': datetime.datetime(2024, 5, 1, 12, 30),
+    'day': datetime.date(2024, 5, 1),
+    'time': datetime.time(7, 45, 1, 500),
+    'duration': datetime.timedelta(minutes=90),
+    'label': gettext_lazy('Recipe'),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'text': 'Crème brûlée   line   paragraph "quoted" \\ \n',
+    'numbers': [1, -2, 3.5, 0.1, None, True, False],
+    'nested': {1: 'int key', 'tags': [{'id': 1, 'name': 'Dinner'}]},
+    'empty': {},
+}, serializer=None)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Tests for rendering JSON with orjson"""
+
+    def test_render_matches_stdlib(self):
+        """Test: Rendered bytes are identical to DRF's JSONRenderer"""
+        self.assertEqual(FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+
+    def test_render_uses_orjson(self):
+        """Test: orjson encodes the data when it is installed"""
+        with patch('rest_framework.renderers.json.dumps') as patched_dumps:
+            FastJSONRenderer().render(DATA)
+        patched_dumps.assert_not_called()
+
+    def test_render_without_orjson_falls_back(self):
+        """Test: Without orjson the stdlib renderer is used"""
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+
+    def test_render_unsupported_values_fall_back(self):
+        """Test: Integers orjson cannot encode are rendered by the stdlib renderer"""
+        data = {'big': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_render_indented_falls_back(self):
+        """Test: Indented output requested by the client is identical to DRF's"""
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, media_type), JSONRenderer().render(DATA, media_type)
+        )
+
+    def test_render_none(self):
+        """Test: Rendering no data returns an empty body"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Tests for parsing JSON with orjson"""
+
+    def _parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {'encoding': 'utf-8'})
+
+    def test_parse_matches_stdlib(self):
+        """Test: Parsed data is identical to DRF's JSONParser"""
+        body = '{"name": "Crème", "price": "5.50", "tags": [{"name": "a"}], "n": 1.5, "big": 123456789012345678901}'
+        self.assertEqual(self._parse(FastJSONParser(), body.encode()), self._parse(JSONParser(), body.encode()))
+
+    def test_parse_invalid_json_error(self):
+        """Test: Invalid JSON raises the same error as DRF's JSONParser"""
+        for body in (b'{"name": ', b'{"value": NaN}', b'[Infinity]'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as fast:
+                    self._parse(FastJSONParser(), body)
+                with self.assertRaises(ParseError) as stdlib:
+                    self._parse(JSONParser(), body)
+                self.assertEqual(str(fast.exception), str(stdlib.exception))
+
+    def test_parse_uses_orjson(self):
+        """Test: orjson decodes ordinary documents when it is installed"""
+        with patch('rest_framework.parsers.json.load') as patched_load:
+            self.assertEqual(self._parse(FastJSONParser(), b'{"price": "5.50"}'), {'price': '5.50'})
+        patched_load.assert_not_called()
+
+    def test_parse_without_orjson_falls_back(self):
+        """Test: Without orjson the stdlib parser is used"""
+        with patch('core.parsers.orjson', None):
+            self.assertEqual(self._parse(FastJSONParser(), b'{"a": [1, 2]}'), {'a': [1, 2]})
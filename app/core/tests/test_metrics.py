@@ -0,0 +1,141 @@
+"""
+Tests for the metrics endpoint
+"""
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+
+METRICS_URL = reverse('metrics')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class MetricsTests(TestCase):
+    """Tests for collecting and exposing metrics"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(METRICS={
+            'ENABLED': True, 'DIR': self.directory, 'FLUSH_INTERVAL': 60, 'ALLOWED_IPS': ['127.0.0.1', '10.0.0.0/8'],
+        }, RESPONSE_CACHE={'ALIAS': 'default', 'TIMEOUT': 300})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        metrics.clear()
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def _scrape(self, **extra):
+        res = self.client.get(METRICS_URL, **extra)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return res.content.decode().splitlines()
+
+    def _write_process(self, pid, data):
+        """Writing the snapshot of another worker process"""
+        with open(os.path.join(self.directory, f'{pid}.json'), 'w') as file:
+            json.dump({'pid': pid, 'metrics': data}, file)
+
+    def test_request_latency_by_route(self):
+        """Test: Request latency and queries are exposed per route"""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        lines = self._scrape()
+
+        labels = 'route="recipe:recipe-list",method="GET",status="200"'
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', lines)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', lines)
+        self.assertTrue(any(line.startswith('http_request_db_queries_total{route="recipe:recipe-list"}')
+                            for line in lines))
+        self.assertIn('# TYPE db_pool_idle_connections gauge', lines)
+
+    def test_response_cache_results(self):
+        """Test: Response cache hits and misses are counted"""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        lines = self._scrape()
+
+        self.assertIn('cache_requests_total{cache="response",result="miss"} 1', lines)
+        self.assertIn('cache_requests_total{cache="response",result="hit"} 1', lines)
+
+    def test_merges_worker_processes(self):
+        """Test: Counters and histograms of every process are summed, gauges only of live ones"""
+        self.client.get(RECIPE_URL)
+        other = subprocess.Popen(['sleep', '10'])
+        self.addCleanup(other.kill)
+        self._write_process(other.pid, {
+            'cache_requests_total': [[['response', 'miss'], 4]],
+            'upload_size_bytes': [[[], [1, 0, 0, 0, 0, 0, 0, 1000.0]]],
+            'db_pool_idle_connections': [[[], 3]],
+        })
+        finished = subprocess.Popen(['true'])
+        finished.wait()
+        self._write_process(finished.pid, {
+            'cache_requests_total': [[['response', 'miss'], 10]],
+            'db_pool_idle_connections': [[[], 7]],
+        })
+
+        lines = self._scrape()
+
+        self.assertIn('cache_requests_total{cache="response",result="miss"} 15', lines)
+        self.assertIn('upload_size_bytes_count 1', lines)
+        self.assertIn('upload_size_bytes_bucket{le="16384.0"} 1', lines)
+        self.assertIn('db_pool_idle_connections 3', lines)
+
+    def test_forbidden_address_error(self):
+        """Test: Addresses outside the allowlist do not see the endpoint"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_allowed_network_success(self):
+        """Test: Addresses inside an allowed network are served"""
+        self._scrape(REMOTE_ADDR='10.1.2.3')
+
+    def test_concurrent_flushes(self):
+        """Test: Threads flushing at the same time leave one complete snapshot"""
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(50):
+                    metrics.flush(force=True)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=flush) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.directory), [f'{os.getpid()}.json'])
+        with open(os.path.join(self.directory, f'{os.getpid()}.json')) as file:
+            self.assertEqual(json.load(file)['pid'], os.getpid())
+
+    def test_write_error_does_not_fail_request(self):
+        """Test: Requests are answered when the snapshot cannot be written"""
+        with patch('core.metrics.os.replace', side_effect=OSError('disk full')), \
+                self.assertLogs('core.metrics', 'WARNING') as logs:
+            res = self.client.get(RECIPE_URL)
+            self._scrape()
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertIn('Writing metrics to', logs.output[0])
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,135 @@
+"""
+Tests for the request timing middleware
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.middleware import RequestTimingMiddleware, normalize_sql
+from core.models import Tag
+from recipe.serializers import TagSerializer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+TIMING = {
+    'ENABLED': True, 'SERVER_TIMING': True, 'SLOW_REQUEST_MS': 60000,
+    'SLOW_QUERY_MS': 60000, 'DUPLICATE_QUERY_THRESHOLD': 3,
+}
+
+
+class SlowTagSerializer(TagSerializer):
+    """Serializer: Tags taking 10 ms each"""
+
+    def to_representation(self, instance):
+        time.sleep(0.01)
+        return super().to_representation(instance)
+
+
+def fetch_tags(count):
+    """View running the same query count times"""
+    def view(request):
+        for number in range(count):
+            list(Tag.objects.filter(id=number))
+        return HttpResponse()
+    return view
+
+
+@override_settings(REQUEST_TIMING=TIMING)
+class RequestTimingMiddlewareTests(TestCase):
+    """Tests for measuring and logging requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header_success(self):
+        """Test: API responses carry their SQL, serializer, view, render and total time"""
+        res = self.client.get(RECIPE_URL)
+
+        names = [metric.split(';')[0] for metric in res['Server-Timing'].split(', ')]
+        self.assertEqual(names, ['db', 'serializer', 'view', 'render', 'total'])
+        self.assertRegex(res['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_request_timing_recorded_success(self):
+        """Test: Query count and durations are kept on the request"""
+        request = RequestFactory().get('/')
+        RequestTimingMiddleware(fetch_tags(2))(request)
+
+        self.assertEqual(request.timing.query_count, 2)
+        self.assertGreater(request.timing.db, 0)
+        self.assertGreaterEqual(request.timing.total, request.timing.db + request.timing.view)
+        self.assertEqual(request.timing.serializer, 0)
+
+    def test_serializer_time_recorded_success(self):
+        """Test: Serializer output is timed apart from SQL and the rest of the view"""
+        Tag.objects.bulk_create(Tag(user=self.user, name=f'Tag {number}') for number in range(3))
+
+        def view(request):
+            self.assertEqual(len(SlowTagSerializer(Tag.objects.all(), many=True).data), 3)
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        RequestTimingMiddleware(view)(request)
+
+        self.assertEqual(request.timing.query_count, 1)
+        self.assertGreaterEqual(request.timing.serializer, 0.03)
+        self.assertLess(request.timing.view, 0.03)
+        self.assertGreaterEqual(request.timing.total, request.timing.db + request.timing.serializer)
+
+    @override_settings(REQUEST_TIMING={**TIMING, 'ENABLED': False})
+    def test_disabled_success(self):
+        """Test: Without timing no header is sent"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING={**TIMING, 'SERVER_TIMING': False})
+    def test_server_timing_header_disabled_success(self):
+        """Test: Requests are measured without sending the header"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertGreater(res.wsgi_request.timing.query_count, 0)
+
+    def test_duplicate_queries_logged(self):
+        """Test: Queries repeated within a request are logged once with normalized SQL"""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            RequestTimingMiddleware(fetch_tags(4))(RequestFactory().get('/tags/'))
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('repeated 4 times in GET /tags/', logs.output[0])
+        self.assertIn('"core_tag"', logs.output[0])
+
+    def test_few_repeated_queries_not_logged(self):
+        """Test: Queries repeated less often than the threshold are not logged"""
+        with patch('core.middleware.logger') as patched_logger:
+            RequestTimingMiddleware(fetch_tags(2))(RequestFactory().get('/'))
+
+        patched_logger.warning.assert_not_called()
+
+    @override_settings(REQUEST_TIMING={**TIMING, 'SLOW_REQUEST_MS': 0, 'SLOW_QUERY_MS': 0})
+    def test_slow_request_and_queries_logged(self):
+        """Test: Slow requests and slow queries are logged"""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        self.assertTrue(any('Slow query' in line for line in logs.output))
+        self.assertTrue(any(f'Slow request GET {RECIPE_URL} (200)' in line for line in logs.output))
+
+
+class NormalizeSQLTests(SimpleTestCase):
+    """Tests for normalizing SQL in logs"""
+
+    def test_normalize_sql(self):
+        """Test: Literals, IN lists and whitespace are normalized"""
+        sql = 'SELECT "id"\n  FROM "core_tag" WHERE "name" = \'it\'\'s\' AND "id" IN (%s, %s, %s) LIMIT 21'
+
+        self.assertEqual(
+            normalize_sql(sql), 'SELECT "id" FROM "core_tag" WHERE "name" = ? AND "id" IN (...) LIMIT ?'
+        )
@@ -1,5 +1,6 @@
 from decimal import Decimal
 from django.test import TestCase
+from django.db import IntegrityError
 from django.contrib.auth import get_user_model
 from core.models import Recipe, Tag, Ingredient, recipe_image_file_path
 from unittest.mock import patch
@@ -89,6 +90,58 @@ class ModelTests(TestCase):
         ingredient = Ingredient.objects.filter(name=self.payload_ingredient['name'])
         self.assertTrue(ingredient)
 
+    def test_create_duplicate_tag_name_error(self):
+        """Test: Creating a second tag with the same name for a user results in error"""
+        Tag.objects.create(**self.payload_tag)
+
+        with self.assertRaises(IntegrityError):
+            Tag.objects.create(**self.payload_tag)
+
+    def test_create_same_ingredient_name_for_other_user_success(self):
+        """Test: Ingredient names are unique per user only"""
+        Ingredient.objects.create(**self.payload_ingredient)
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+
+        Ingredient.objects.create(name=self.payload_ingredient['name'], user=other_user)
+
+        ingredients = Ingredient.objects.filter(name=self.payload_ingredient['name'])
+        self.assertEqual(ingredients.count(), 2)
+
+    def test_recipe_relation_ids_follow_links_success(self):
+        """Test: Linking and unlinking tags and ingredients updates the sorted id arrays"""
+        recipe = Recipe.objects.create(**self.payload_recipe)
+        user = self.payload_recipe['user']
+        tags = [Tag.objects.create(user=user, name=f'Tag {number}') for number in range(3)]
+        ingredient = Ingredient.objects.create(**self.payload_ingredient)
+
+        recipe.tags.add(tags[2], tags[0])
+        recipe.ingredients.add(ingredient)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [tags[0].id, tags[2].id])
+        self.assertEqual(recipe.ingredient_ids, [ingredient.id])
+
+        recipe.tags.set([tags[1], tags[2]])
+        tags[2].delete()
+        recipe.ingredients.clear()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [tags[1].id])
+        self.assertEqual(recipe.ingredient_ids, [])
+
+    def test_recipe_save_keeps_relation_ids_success(self):
+        """Test: Saving an instance loaded before its links changed keeps the id arrays"""
+        recipe = Recipe.objects.create(**self.payload_recipe)
+        tag = Tag.objects.create(**self.payload_tag)
+        stale = Recipe.objects.get(id=recipe.id)
+
+        recipe.tags.add(tag)
+        stale.name = 'Renamed'
+        stale.tag_ids = [12345]
+        stale.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Renamed')
+        self.assertEqual(recipe.tag_ids, [tag.id])
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test: Generating image path results in success"""
@@ -0,0 +1,26 @@
+"""Views for operating the service"""
+import ipaddress
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+from core import metrics
+
+
+def _allowed(address):
+    """Checking address against the addresses and networks in METRICS['ALLOWED_IPS']"""
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(allowed, strict=False) for allowed in settings.METRICS['ALLOWED_IPS'])
+
+
+@require_GET
+def metrics_view(request):
+    """View: Metrics of all worker processes in the Prometheus text format"""
+    # Answering like an unknown URL keeps the endpoint hidden from everyone else
+    if not settings.METRICS['ENABLED'] or not _allowed(request.META.get('REMOTE_ADDR', '')):
+        raise Http404
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
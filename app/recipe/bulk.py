@@ -0,0 +1,145 @@
+"""
+Bulk import and export of recipes
+
+Imported rows are validated and written in chunks. Tags and ingredients of
+a whole chunk are resolved with a few set-based queries, then recipes and
+their through rows are inserted with bulk_create.
+
+Exports read recipes through a server-side cursor and prefetch relations
+one batch at a time, so memory use does not grow with the catalog.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_generation
+from recipe.serializers import RecipeImportSerializer, get_or_create_by_name
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield start, rows[start:start + size]
+
+
+def import_recipes(user, rows, context):
+    """Creating recipes of user from rows, returning a report of every row"""
+    report = []
+    for start, chunk in _chunks(rows, settings.RECIPE_BULK_IMPORT['CHUNK_SIZE']):
+        valid = []
+        for index, row in enumerate(chunk, start=start):
+            serializer = RecipeImportSerializer(data=row, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                report.append({'index': index, 'errors': serializer.errors})
+
+        if valid:
+            recipes = _create_chunk(user, [data for _, data in valid])
+            report.extend({'index': index, 'id': recipe.pk} for (index, _), recipe in zip(valid, recipes))
+
+    if any('id' in row for row in report):
+        # bulk_create sends no signals, cached lists are invalidated here
+        bump_generation(user.pk)
+    return sorted(report, key=lambda row: row['index'])
+
+
+@transaction.atomic
+def _create_chunk(user, chunk):
+    """Inserting one chunk of validated rows, returning the recipes in row order"""
+    tags = _resolve(Tag, user, chunk, 'tags')
+    ingredients = _resolve(Ingredient, user, chunk, 'ingredients')
+
+    recipes = Recipe.objects.bulk_create([
+        Recipe(user=user, **{key: value for key, value in data.items() if key not in ('tags', 'ingredients')})
+        for data in chunk
+    ])
+
+    tag_links, ingredient_links = [], []
+    for recipe, data in zip(recipes, chunk):
+        for name in dict.fromkeys(item['name'] for item in data.get('tags', [])):
+            tag_links.append(Recipe.tags.through(recipe_id=recipe.pk, tag_id=tags[name].pk))
+        for name in dict.fromkeys(item['name'] for item in data.get('ingredients', [])):
+            ingredient_links.append(
+                Recipe.ingredients.through(recipe_id=recipe.pk, ingredient_id=ingredients[name].pk)
+            )
+    Recipe.tags.through.objects.bulk_create(tag_links)
+    Recipe.ingredients.through.objects.bulk_create(ingredient_links)
+
+    return recipes
+
+
+def _resolve(model, user, chunk, field):
+    """Getting or creating every object named in field of the chunk's rows"""
+    items = [item for data in chunk for item in data.get(field, [])]
+    return {obj.name: obj for obj in get_or_create_by_name(model, user, items)}
+
+
+EXPORT_FIELDS = ('id', 'name', 'time_minutes', 'price', 'description', 'link', 'image', 'tags', 'ingredients')
+
+
+def iter_recipes(user, chunk_size):
+    """Yielding batches of user's recipes with tags and ingredients prefetched"""
+    queryset = Recipe.objects.filter(user=user).order_by('id').only(
+        *(field for field in EXPORT_FIELDS if field not in ('tags', 'ingredients'))
+    )
+    lookups = (
+        Prefetch('tags', queryset=Tag.objects.only('id', 'name').order_by('id')),
+        Prefetch('ingredients', queryset=Ingredient.objects.only('id', 'name').order_by('id')),
+    )
+    # iterator() skips prefetch_related, relations are prefetched per batch instead
+    batch = []
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        batch.append(recipe)
+        if len(batch) == chunk_size:
+            prefetch_related_objects(batch, *lookups)
+            yield batch
+            batch = []
+    if batch:
+        prefetch_related_objects(batch, *lookups)
+        yield batch
+
+
+def _export_row(recipe, request):
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'time_minutes': recipe.time_minutes,
+        'price': recipe.price,
+        'description': recipe.description,
+        'link': recipe.link,
+        'image': request.build_absolute_uri(recipe.image.url) if recipe.image else '',
+        'tags': [tag.name for tag in recipe.tags.all()],
+        'ingredients': [ingredient.name for ingredient in recipe.ingredients.all()],
+    }
+
+
+def export_ndjson(request):
+    """Yielding user's recipes as JSON Lines, one chunk of text per batch"""
+    for batch in iter_recipes(request.user, settings.RECIPE_EXPORT['CHUNK_SIZE']):
+        yield ''.join(json.dumps(_export_row(recipe, request), cls=DjangoJSONEncoder) + '\n' for recipe in batch)
+
+
+class _Echo:
+    """File-like object returning what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(request):
+    """Yielding user's recipes as CSV, tags and ingredients joined with semicolons"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for batch in iter_recipes(request.user, settings.RECIPE_EXPORT['CHUNK_SIZE']):
+        rows = []
+        for recipe in batch:
+            row = _export_row(recipe, request)
+            row['tags'] = ';'.join(row['tags'])
+            row['ingredients'] = ';'.join(row['ingredients'])
+            rows.append(writer.writerow([row[field] for field in EXPORT_FIELDS]))
+        yield ''.join(rows)
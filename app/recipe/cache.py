@@ -0,0 +1,87 @@
+"""
+Caching of list responses for Recipe APIs
+
+Every user has a generation counter that is bumped on any write to their
+recipes, tags or ingredients. List responses are cached under keys that
+embed the generation, so one increment invalidates all of them at once.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from http import HTTPStatus
+from rest_framework.response import Response
+
+from core import metrics
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE['ALIAS']]
+
+
+def _generation_key(user_id):
+    return f'recipe-generation:{user_id}'
+
+
+def get_generation(user_id):
+    """Returning current generation of user's data"""
+    key = _generation_key(user_id)
+    generation = _cache().get(key)
+    if generation is None:
+        # Starting from the clock keeps a lost counter from reviving old entries
+        _cache().add(key, time.time_ns(), None)
+        generation = _cache().get(key)
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidating every cached list response of the user"""
+    key = _generation_key(user_id)
+    try:
+        _cache().incr(key)
+    except ValueError:
+        _cache().add(key, time.time_ns(), None)
+
+
+def list_cache_key(request, basename):
+    """Building the key of a list response for user, generation and query string"""
+    user_id = request.user.pk
+    query = sorted(request.query_params.lists())
+    digest = hashlib.sha256(
+        f'{request.scheme}://{request.get_host()}{request.path}?{query}'.encode()
+    ).hexdigest()
+    return f'recipe-list:{basename}:{user_id}:{get_generation(user_id)}:{digest}'
+
+
+class CachedListMixin:
+    """View: Serving list responses from cache until the user's data changes"""
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE['TIMEOUT']:
+            return super().list(request, *args, **kwargs)
+
+        key = list_cache_key(request, self.basename)
+        etag = '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+        # If-None-Match uses weak comparison, W/ prefixes are ignored
+        client_etags = [tag[2:] if tag.startswith('W/') else tag
+                        for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+        if etag in client_etags or '*' in client_etags:
+            metrics.CACHE_REQUESTS.inc(cache='response', result='not_modified')
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            data = _cache().get(key)
+            if data is None:
+                metrics.CACHE_REQUESTS.inc(cache='response', result='miss')
+                response = super().list(request, *args, **kwargs)
+                _cache().set(key, response.data, settings.RESPONSE_CACHE['TIMEOUT'])
+            else:
+                metrics.CACHE_REQUESTS.inc(cache='response', result='hit')
+                response = Response(data)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Authorization',))
+        return response
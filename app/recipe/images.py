@@ -0,0 +1,95 @@
+"""
+Resized derivatives of uploaded recipe images
+
+Derivatives are generated off the request path by a thread pool once the
+upload is committed, and recorded on Recipe.image_derivatives as
+{size: {format: storage name}}.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from core.models import Recipe
+from recipe.cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('webp', 'jpeg') if features.check('webp') else ('jpeg',)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Creating the worker pool on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_DERIVATIVES['WORKERS'],
+                thread_name_prefix='recipe-image',
+            )
+    return _executor
+
+
+def schedule_derivatives(recipe):
+    """Generating derivatives of recipe's image after the current transaction commits"""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(lambda: _submit(recipe_id, image_name))
+
+
+def _submit(recipe_id, image_name):
+    if settings.RECIPE_IMAGE_DERIVATIVES['WORKERS']:
+        _get_executor().submit(_generate_in_worker, recipe_id, image_name)
+    else:
+        generate_derivatives(recipe_id, image_name)
+
+
+def _generate_in_worker(recipe_id, image_name):
+    try:
+        generate_derivatives(recipe_id, image_name)
+    except Exception:
+        logger.exception('Generating derivatives of %s failed', image_name)
+    finally:
+        close_old_connections()
+
+
+def generate_derivatives(recipe_id, image_name):
+    """Saving resized copies of the image and recording them on the recipe"""
+    options = settings.RECIPE_IMAGE_DERIVATIVES
+    base, _ = os.path.splitext(os.path.basename(image_name))
+    derivatives = {}
+    with default_storage.open(image_name) as source, Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for label, size in options['SIZES'].items():
+            variant = image.copy()
+            variant.thumbnail((size, size))
+            for image_format in FORMATS:
+                buffer = BytesIO()
+                variant.save(buffer, format=image_format.upper(), quality=options['QUALITY'])
+                name = os.path.join('uploads', 'recipe', 'derivatives', f'{base}-{label}.{image_format}')
+                derivatives.setdefault(label, {})[image_format] = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+
+    # The image may have been replaced while the derivatives were generated
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(image_derivatives=derivatives)
+    if not updated:
+        delete_derivatives(derivatives)
+        return
+    bump_generation(Recipe.objects.values_list('user_id', flat=True).get(pk=recipe_id))
+
+
+def delete_derivatives(derivatives):
+    """Removing derivative files from storage"""
+    for formats in derivatives.values():
+        for name in formats.values():
+            default_storage.delete(name)
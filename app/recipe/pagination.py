@@ -0,0 +1,16 @@
+"""
+Pagination for Recipe APIs
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Pagination: Keyset pages from newest to oldest with an opaque cursor"""
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        """Ordering set by the view for the request, newest first otherwise"""
+        return getattr(view, 'cursor_ordering', None) or super().get_ordering(request, queryset, view)
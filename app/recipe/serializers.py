@@ -1,15 +1,112 @@
 """
 Serializers for Recipe model
 """
-from rest_framework.serializers import ModelSerializer
+from rest_framework.relations import MANY_RELATION_KWARGS
+from rest_framework.serializers import ModelSerializer, ReadOnlyField, Serializer, IntegerField, DecimalField, \
+    ChoiceField, ListField, ValidationError, ManyRelatedField, PrimaryKeyRelatedField
+from django.utils.translation import gettext_lazy as _
+from django.core.files.storage import default_storage
+from django.db import transaction
 from core.models import Recipe, Tag, Ingredient
 
 
+def get_or_create_by_name(model, user, items):
+    """Getting or creating user's objects by name with one select and one insert"""
+    names = list(dict.fromkeys(item['name'] for item in items))
+    if not names:
+        return []
+
+    existing = {obj.name: obj for obj in model.objects.filter(user=user, name__in=names)}
+    missing = [name for name in names if name not in existing]
+    if missing:
+        # Names inserted meanwhile by concurrent requests are skipped and selected below
+        model.objects.bulk_create([model(user=user, name=name) for name in missing], ignore_conflicts=True)
+        existing.update((obj.name, obj) for obj in model.objects.filter(user=user, name__in=missing))
+
+    return [existing[name] for name in names]
+
+
+# Orderings of the recipe list by ordering parameter, ties are broken by id in the
+# same direction so that one (user, field, id) index serves both directions
+RECIPE_ORDERINGS = {
+    '-id': ('-id',),
+    'id': ('id',),
+    'time_minutes': ('time_minutes', 'id'),
+    '-time_minutes': ('-time_minutes', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+}
+
+
+class RecipeFilterSerializer(Serializer):
+    """Serializer: Recipe-list query parameters"""
+    min_time = IntegerField(required=False, min_value=0)
+    max_time = IntegerField(required=False, min_value=0)
+    min_price = DecimalField(required=False, max_digits=5, decimal_places=2, min_value=0)
+    max_price = DecimalField(required=False, max_digits=5, decimal_places=2, min_value=0)
+    ordering = ChoiceField(required=False, choices=list(RECIPE_ORDERINGS))
+    match = ChoiceField(required=False, choices=['any', 'all'], default='any')
+
+    def validate(self, attrs):
+        for low, high in (('min_time', 'max_time'), ('min_price', 'max_price')):
+            if low in attrs and high in attrs and attrs[low] > attrs[high]:
+                raise ValidationError({low: [_('Must not be greater than %s.') % high]})
+        return attrs
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    """Field: List of primary keys resolved with one query instead of one per key"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        for pk in data:
+            if isinstance(pk, (bool, dict, list)):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+        try:
+            found = {str(obj.pk): obj for obj in child.get_queryset().filter(pk__in=list(data))}
+        except (TypeError, ValueError):
+            child.fail('incorrect_type', data_type=type(next(iter(data))).__name__)
+        missing = [pk for pk in data if str(pk) not in found]
+        if missing:
+            child.fail('does_not_exist', pk_value=missing[0])
+        return [found[str(pk)] for pk in data]
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """Field: Primary key relation whose many=True variant is a BulkManyRelatedField"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {key: value for key, value in kwargs.items() if key in MANY_RELATION_KWARGS}
+        return BulkManyRelatedField(child_relation=cls(*args, **kwargs), **list_kwargs)
+
+
+class ImageDerivativesField(ReadOnlyField):
+    """Field: URLs of resized copies of the recipe image by size and format"""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for label, formats in value.items():
+            urls[label] = {}
+            for image_format, name in formats.items():
+                url = default_storage.url(name)
+                urls[label][image_format] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
 class ImageSerializer(ModelSerializer):
     """Serializer: recipe-upload-image"""
+    image_derivatives = ImageDerivativesField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image',)
+        fields = ('id', 'image', 'image_derivatives')
         read_only_fields = ('id',)
         extra_kwargs = {'image': {'required': 'True'}}
 
@@ -30,7 +127,23 @@ class IngredientSerializer(ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(ModelSerializer):
+class SparseFieldsetMixin:
+    """Serializer: Rendering only requested fields, relations as ids unless expanded"""
+    # Relation: (id array column rendered when not expanded, serializer of expanded objects)
+    RELATIONS = {'tags': ('tag_ids', TagSerializer), 'ingredients': ('ingredient_ids', IngredientSerializer)}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+            for name in set(fields) & set(self.RELATIONS) - set(expand):
+                self.fields[name] = ListField(child=IntegerField(), source=self.RELATIONS[name][0], read_only=True)
+        for name in expand:
+            self.fields[name] = self.RELATIONS[name][1](many=True, read_only=True)
+
+
+class RecipeSerializer(SparseFieldsetMixin, ModelSerializer):
     """Serializer: Recipes-list"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -40,47 +153,38 @@ class RecipeSerializer(ModelSerializer):
         fields = ('id', 'name', 'tags', 'ingredients', 'time_minutes', 'link')
         read_only_fields = ('id',)
 
-    def _get_or_create_tags(self, tags, recipe):
+    def _get_or_create_tags(self, tags):
         """Handle getting or creating tags as needed."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
-
-    def _get_or_create_ingredients(self, ingredients, recipe):
+        return get_or_create_by_name(Tag, auth_user, tags)
+
+    def _get_or_create_ingredients(self, ingredients):
         """Handle getting or creating ingredients as needed."""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        return get_or_create_by_name(Ingredient, auth_user, ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe"""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        recipe.tags.add(*self._get_or_create_tags(tags))
+        recipe.ingredients.add(*self._get_or_create_ingredients(ingredients))
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update recipe"""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
+        # set() only removes and adds the difference to what is already linked
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_tags(tags))
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            instance.ingredients.set(self._get_or_create_ingredients(ingredients))
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -89,8 +193,18 @@ class RecipeSerializer(ModelSerializer):
         return instance
 
 
-class RecipeDetailSerializer(ModelSerializer):
-    """Serializer: Recipe-detail"""
+class RecipeImportSerializer(RecipeSerializer):
+    """Serializer: Recipe-bulk-import row"""
 
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ('description', 'price')
+
+
+class RecipeDetailSerializer(SparseFieldsetMixin, ModelSerializer):
+    """Serializer: Recipe-detail"""
+    image_derivatives = ImageDerivativesField()
+
+    serializer_related_field = BulkPrimaryKeyRelatedField
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('description', 'price', 'image_derivatives')
@@ -0,0 +1,27 @@
+"""
+Signals invalidating cached Recipe API responses
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_generation
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_owner_generation(sender, instance, **kwargs):
+    """Any write to a recipe, tag or ingredient invalidates its owner's lists"""
+    bump_generation(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_owner_generation_on_links(sender, instance, action, **kwargs):
+    """Linking or unlinking tags and ingredients invalidates the owner's lists"""
+    if action.startswith('post_'):
+        bump_generation(instance.user_id)
@@ -0,0 +1,125 @@
+"""
+Tests for the fast path of list responses
+"""
+from decimal import Decimal
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import fastpath
+from recipe.fastpath import plan_fields
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+NO_CACHE = {'ALIAS': 'default', 'TIMEOUT': 0}
+
+
+@override_settings(RESPONSE_CACHE=NO_CACHE)
+class FastListParityTests(TestCase):
+    """Tests that fast path responses are identical to serializer responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+        tags = [Tag.objects.create(user=self.user, name=name) for name in ('Vegan', 'Quick', 'Dinner')]
+        ingredients = [Ingredient.objects.create(user=self.user, name=name) for name in ('Rice', 'Salt', 'Tofu')]
+        for number in range(7):
+            recipe = Recipe.objects.create(
+                user=self.user, name=f'Curry {number}', time_minutes=10 + number % 3,
+                price=Decimal(number % 4) + Decimal('0.50'), description='Spicy' if number % 2 else 'Mild',
+                link='' if number % 2 else f'https://example.com/{number}',
+            )
+            recipe.tags.add(*tags[number % 3:])
+            recipe.ingredients.add(*ingredients[:number % 4])
+        Tag.objects.create(user=self.user, name='Unused')
+
+    def _get_pages(self, url, params):
+        """Following cursors and returning the raw content of every page"""
+        contents = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, HTTPStatus.OK, res.content)
+            contents.append(res.content)
+            if not res.data.get('next'):
+                return contents
+            res = self.client.get(res.data['next'])
+
+    def assert_parity(self, url, params=None):
+        """Comparing every page of url rendered with and without the fast path"""
+        params = params or {}
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self._get_pages(url, params)
+        with override_settings(FAST_LIST_SERIALIZATION=True), \
+                patch('recipe.fastpath.build_rows', wraps=fastpath.build_rows) as built:
+            actual = self._get_pages(url, params)
+        built.assert_called()
+        self.assertEqual(actual, expected)
+
+    def test_recipe_list_parity(self):
+        """Test: Recipe list pages are identical on the fast path"""
+        self.assert_parity(RECIPE_URL, {'page_size': 3})
+
+    def test_recipe_list_filters_parity(self):
+        """Test: Filtered, searched and ordered recipe lists are identical on the fast path"""
+        vegan = Tag.objects.get(name='Vegan')
+        rice = Ingredient.objects.get(name='Rice')
+        for params in (
+            {'tags': str(vegan.id), 'ingredients': str(rice.id)},
+            {'tags': str(vegan.id), 'match': 'all'},
+            {'search': 'spicy', 'page_size': 2},
+            {'ordering': '-price', 'page_size': 2},
+            {'ordering': 'time_minutes', 'max_price': '2.50', 'page_size': 2},
+        ):
+            with self.subTest(params=params):
+                self.assert_parity(RECIPE_URL, params)
+
+    def test_recipe_list_sparse_fieldset_parity(self):
+        """Test: Recipe lists narrowed with fields and expand are identical on the fast path"""
+        for params in (
+            {'fields': 'id,name'},
+            {'fields': 'name,tags,ingredients'},
+            {'fields': 'id', 'expand': 'tags'},
+        ):
+            with self.subTest(params=params):
+                self.assert_parity(RECIPE_URL, params)
+
+    def test_tag_and_ingredient_list_parity(self):
+        """Test: Tag and ingredient lists are identical on the fast path"""
+        for url in (TAG_URL, INGREDIENT_URL):
+            for params in ({}, {'assigned_only': 1}, {'page_size': 2}):
+                with self.subTest(url=url, params=params):
+                    self.assert_parity(url, params)
+
+    def test_empty_list_parity(self):
+        """Test: Lists without rows are identical on the fast path"""
+        self.assert_parity(RECIPE_URL, {'search': 'nothing matches this'})
+
+    @override_settings(FAST_LIST_SERIALIZATION=True)
+    def test_fast_recipe_list_fixed_query_count(self):
+        """Test: Fast path runs one query for rows and one per nested relation"""
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 7)
+
+
+class PlanFieldsTests(TestCase):
+    """Tests for deciding which serializers the fast path supports"""
+
+    def test_list_serializer_supported(self):
+        """Test: Recipe list serializer is built from values rows"""
+        plan = plan_fields(RecipeSerializer(), Recipe)
+        self.assertEqual([name for name, _, _ in plan], list(RecipeSerializer.Meta.fields))
+
+    def test_detail_serializer_not_supported(self):
+        """Test: Serializers with formatted fields fall back to the serializer"""
+        self.assertIsNone(plan_fields(RecipeDetailSerializer(), Recipe))
@@ -12,6 +12,7 @@ from recipe.tests.test_recipe_api import create_recipe
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+INGREDIENTS_TYPEAHEAD_URL = reverse('recipe:ingredient-typeahead')
 
 
 def create_user(email='user@example.com', password='password123'):
@@ -65,7 +66,7 @@ class IngredientPrivateTests(TestCase):
         self.assertTrue(ingredients)
 
         serializer = IngredientSerializer(ingredients, many=True)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data['results'])
 
     def test_ingredient_list_only_for_creators_success(self):
         """Test: Listing ingredients works only for creators"""
@@ -75,13 +76,13 @@ class IngredientPrivateTests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL)
         self.assertEqual(res.status_code, HTTPStatus.OK)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
 
         ingredients = Ingredient.objects.filter(user=self.user.id).order_by('-id')
         self.assertTrue(ingredients)
 
         serializer = IngredientSerializer(ingredients, many=True)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data['results'])
 
     def test_ingredient_update_success(self):
         """Test: Updating ingredients results in success"""
@@ -117,23 +118,33 @@ class IngredientPrivateTests(TestCase):
 
         ser1 = IngredientSerializer(ing1)
         ser2 = IngredientSerializer(ing2)
-        self.assertIn(ser1.data, res.data)
-        self.assertNotIn(ser2.data, res.data)
+        self.assertIn(ser1.data, res.data['results'])
+        self.assertNotIn(ser2.data, res.data['results'])
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 0})
         self.assertEqual(res.status_code, HTTPStatus.OK)
-        self.assertIn(ser1.data, res.data)
-        self.assertIn(ser2.data, res.data)
+        self.assertIn(ser1.data, res.data['results'])
+        self.assertIn(ser2.data, res.data['results'])
 
     def test_filter_ingredients_only_unique_success(self):
         """Test: Filtering ingredients returns only unique ones"""
         ing1 = Ingredient.objects.create(name='Flour', user=self.user)
-        ing2 = Ingredient.objects.create(name='Flour', user=self.user)
+        ing2 = Ingredient.objects.create(name='Sugar', user=self.user)
         recipe1 = create_recipe(self.user)
         recipe2 = create_recipe(self.user)
         recipe1.ingredients.add(ing1)
-        recipe2.ingredients.add(ing2)
+        recipe2.ingredients.add(ing1, ing2)
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
         self.assertEqual(res.status_code, HTTPStatus.OK)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_typeahead_ingredients_success(self):
+        """Test: Typeahead returns user's ingredients starting with the query"""
+        flour = create_ingredient('Flour', self.user)
+        create_ingredient('Salt', self.user)
+
+        res = self.client.get(INGREDIENTS_TYPEAHEAD_URL, {'q': 'fl'})
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data, [IngredientSerializer(flour).data])
@@ -0,0 +1,283 @@
+"""
+Tests for query budgets of the recipe, tag and ingredient APIs
+"""
+import tempfile
+from decimal import Decimal
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.testing import QueryBudgetMixin
+
+RECIPE_URL = reverse('recipe:recipe-list')
+BULK_IMPORT_URL = reverse('recipe:recipe-bulk-import')
+EXPORT_URL = reverse('recipe:recipe-export')
+TAG_URL = reverse('recipe:tag-list')
+TAG_TYPEAHEAD_URL = reverse('recipe:tag-typeahead')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+INGREDIENT_TYPEAHEAD_URL = reverse('recipe:ingredient-typeahead')
+
+NO_CACHE = {'ALIAS': 'default', 'TIMEOUT': 0}
+
+
+def detail_url(basename, pk):
+    return reverse(f'recipe:{basename}-detail', args=[pk])
+
+
+@override_settings(RESPONSE_CACHE=NO_CACHE)
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Test: Base for scaling requests against related rows of an authenticated user"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count, tags=2, ingredients=2):
+        """Creating count recipes sharing tags and ingredients"""
+        tag_objects = [Tag.objects.get_or_create(user=self.user, name=f'Tag {i}')[0] for i in range(tags)]
+        ingredient_objects = [
+            Ingredient.objects.get_or_create(user=self.user, name=f'Ingredient {i}')[0] for i in range(ingredients)
+        ]
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user, name=f'Curry {number}', time_minutes=10, price=Decimal('5.50'),
+                description='Spicy curry',
+            )
+            recipe.tags.add(*tag_objects)
+            recipe.ingredients.add(*ingredient_objects)
+            recipes.append(recipe)
+        return recipes
+
+    def create_recipe_with(self, count):
+        """Creating a recipe with count tags and count ingredients"""
+        return self.create_recipes(1, tags=count, ingredients=count)[0]
+
+    def request(self, method, url, data=None, status=HTTPStatus.OK, **kwargs):
+        """Sending a request and checking its status"""
+        res = getattr(self.client, method)(url, data, **kwargs)
+        self.assertEqual(res.status_code, status, getattr(res, 'data', res))
+        if res.streaming:
+            b''.join(res.streaming_content)
+        return res
+
+
+class RecipeQueryBudgetTests(QueryBudgetTestCase):
+    """Tests for query budgets of recipe endpoints"""
+
+    def test_list_budget(self):
+        """Test: Listing recipes runs a fixed number of queries"""
+        self.assertQueriesScale(self.create_recipes, lambda _: self.request('get', RECIPE_URL), budget=3)
+
+    def test_list_with_many_tags_budget(self):
+        """Test: Listing recipes with many tags each runs a fixed number of queries"""
+        self.assertQueriesScale(
+            lambda size: self.create_recipes(5, tags=size, ingredients=size),
+            lambda _: self.request('get', RECIPE_URL), budget=3,
+        )
+
+    def test_list_filters_budget(self):
+        """Test: Filtered, searched, ordered and narrowed recipe lists run a fixed number of queries"""
+        def setup(size):
+            recipe = self.create_recipes(size)[0]
+            return recipe.tags.first().id, recipe.ingredients.first().id
+
+        for label, params, budget in (
+            ('tags', lambda ids: {'tags': ids[0], 'ingredients': ids[1]}, 3),
+            ('match', lambda ids: {'tags': ids[0], 'match': 'all'}, 3),
+            ('search', lambda _: {'search': 'curry'}, 3),
+            ('ranges', lambda _: {'ordering': '-price', 'min_time': 5, 'max_price': '10'}, 3),
+            ('fields', lambda _: {'fields': 'id,name'}, 1),
+            ('expand', lambda _: {'fields': 'id', 'expand': 'tags'}, 2),
+        ):
+            with self.subTest(label):
+                self.assertQueriesScale(
+                    setup, lambda ids: self.request('get', RECIPE_URL, params(ids)), budget=budget
+                )
+
+    def test_detail_budget(self):
+        """Test: Retrieving a recipe runs a fixed number of queries"""
+        self.assertQueriesScale(
+            self.create_recipe_with, lambda recipe: self.request('get', detail_url('recipe', recipe.id)), budget=3
+        )
+
+    def test_create_budget(self):
+        """Test: Creating a recipe with new and existing tags runs a fixed number of queries"""
+        def setup(size):
+            Tag.objects.create(user=self.user, name='Existing')
+            return {
+                'name': 'Curry', 'time_minutes': 10, 'price': '5.50',
+                'tags': [{'name': 'Existing'}] + [{'name': f'Tag {i}'} for i in range(size)],
+                'ingredients': [{'name': f'Ingredient {i}'} for i in range(size)],
+            }
+
+        self.assertQueriesScale(
+            setup, lambda payload: self.request('post', RECIPE_URL, payload, HTTPStatus.CREATED, format='json'),
+            budget=15,
+        )
+
+    def test_update_budget(self):
+        """Test: Replacing a recipe and its tags runs a fixed number of queries"""
+        def setup(size):
+            recipe = self.create_recipe_with(size)
+            tags = [Tag.objects.create(user=self.user, name=f'New tag {i}') for i in range(size)]
+            return recipe, {
+                'name': 'Stew', 'time_minutes': 20, 'price': '3.00',
+                'tags': [tag.id for tag in tags],
+                'ingredients': list(recipe.ingredients.values_list('id', flat=True)),
+            }
+
+        self.assertQueriesScale(
+            setup,
+            lambda state: self.request('put', detail_url('recipe', state[0].id), state[1], format='json'),
+            budget=11,
+        )
+
+    def test_partial_update_budget(self):
+        """Test: Updating fields of a recipe with many tags runs a fixed number of queries"""
+        self.assertQueriesScale(
+            self.create_recipe_with,
+            lambda recipe: self.request('patch', detail_url('recipe', recipe.id), {'name': 'Stew'}, format='json'),
+            budget=6,
+        )
+
+    def test_delete_budget(self):
+        """Test: Deleting a recipe with many tags runs a fixed number of queries"""
+        self.assertQueriesScale(
+            self.create_recipe_with,
+            lambda recipe: self.request('delete', detail_url('recipe', recipe.id), status=HTTPStatus.NO_CONTENT),
+            budget=5,
+        )
+
+    def test_upload_image_budget(self):
+        """Test: Uploading an image to a recipe with many tags runs a fixed number of queries"""
+        def upload(recipe):
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+                Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+                image_file.seek(0)
+                res = self.request(
+                    'post', reverse('recipe:recipe-upload-image', args=[recipe.id]), {'image': image_file},
+                    format='multipart',
+                )
+            self.addCleanup(default_storage.delete, res.data['image'].split(settings.MEDIA_URL, 1)[1])
+
+        self.assertQueriesScale(self.create_recipe_with, upload, budget=4)
+
+    def test_bulk_import_budget(self):
+        """Test: Bulk importing rows runs a fixed number of queries"""
+        def setup(size):
+            return [
+                {'name': f'Recipe {i}', 'time_minutes': 5, 'tags': [{'name': 'Dinner'}],
+                 'ingredients': [{'name': f'Ingredient {i}'}]}
+                for i in range(size)
+            ]
+
+        self.assertQueriesScale(
+            setup, lambda rows: self.request('post', BULK_IMPORT_URL, rows, format='json'), budget=13
+        )
+
+    def test_export_budget(self):
+        """Test: Exporting recipes runs a fixed number of queries"""
+        for export_format in ('ndjson', 'csv'):
+            with self.subTest(export_format=export_format):
+                self.assertQueriesScale(
+                    self.create_recipes,
+                    lambda _: self.request('get', EXPORT_URL, {'export_format': export_format}),
+                    budget=3,
+                )
+
+
+class TagAndIngredientQueryBudgetTests(QueryBudgetTestCase):
+    """Tests for query budgets of tag and ingredient endpoints"""
+
+    ENDPOINTS = (
+        ('tag', Tag, TAG_URL, TAG_TYPEAHEAD_URL),
+        ('ingredient', Ingredient, INGREDIENT_URL, INGREDIENT_TYPEAHEAD_URL),
+    )
+
+    def create_items(self, model, count):
+        """Creating count items, each assigned to a recipe"""
+        recipe = Recipe.objects.create(user=self.user, name='Curry', time_minutes=10)
+        items = [model.objects.create(user=self.user, name=f'Name {i}') for i in range(count)]
+        getattr(recipe, f'{model._meta.model_name}s').add(*items)
+        return items
+
+    def create_item_in_recipes(self, model, count):
+        """Creating an item assigned to count recipes"""
+        item = model.objects.create(user=self.user, name='Popular')
+        for recipe in self.create_recipes(count, tags=0, ingredients=0):
+            getattr(recipe, f'{model._meta.model_name}s').add(item)
+        return item
+
+    def test_list_budget(self):
+        """Test: Listing tags and ingredients runs a fixed number of queries"""
+        for basename, model, url, _ in self.ENDPOINTS:
+            for params in ({}, {'assigned_only': 1}):
+                with self.subTest(basename=basename, params=params):
+                    self.assertQueriesScale(
+                        lambda size: self.create_items(model, size),
+                        lambda _: self.request('get', url, params), budget=1,
+                    )
+
+    def test_typeahead_budget(self):
+        """Test: Typeahead runs a fixed number of queries"""
+        for basename, model, _, url in self.ENDPOINTS:
+            with self.subTest(basename=basename):
+                self.assertQueriesScale(
+                    lambda size: self.create_items(model, size),
+                    lambda _: self.request('get', url, {'q': 'nam'}), budget=1,
+                )
+
+    def test_update_budget(self):
+        """Test: Renaming an item used by many recipes runs a fixed number of queries"""
+        for basename, model, _, _ in self.ENDPOINTS:
+            with self.subTest(basename=basename):
+                self.assertQueriesScale(
+                    lambda size: self.create_item_in_recipes(model, size),
+                    lambda item: self.request('patch', detail_url(basename, item.id), {'name': 'Renamed'}),
+                    budget=4,
+                )
+
+    def test_delete_budget(self):
+        """Test: Deleting an item used by many recipes runs a fixed number of queries"""
+        for basename, model, _, _ in self.ENDPOINTS:
+            with self.subTest(basename=basename):
+                self.assertQueriesScale(
+                    lambda size: self.create_item_in_recipes(model, size),
+                    lambda item: self.request('delete', detail_url(basename, item.id), status=HTTPStatus.NO_CONTENT),
+                    budget=4,
+                )
+
+
+class QueryBudgetMixinTests(QueryBudgetTestCase):
+    """Tests for the query budget assertions"""
+
+    def test_n_plus_one_fails_with_sql(self):
+        """Test: Queries growing with rows fail and print the offending SQL"""
+        def n_plus_one(_):
+            for recipe in Recipe.objects.filter(user=self.user):
+                list(recipe.tags.all())
+
+        with self.assertRaises(AssertionError) as failure:
+            self.assertQueriesScale(self.create_recipes, n_plus_one, budget=100, scales=(1, 3))
+
+        self.assertIn('Queries grow with related rows {1: 2, 3: 4}', str(failure.exception))
+        self.assertIn('"core_recipe_tags"', str(failure.exception))
+
+    def test_over_budget_fails(self):
+        """Test: Running more queries than the budget fails"""
+        with self.assertRaises(AssertionError) as failure:
+            with self.assertQueryBudget(1):
+                list(Recipe.objects.all())
+                list(Tag.objects.all())
+
+        self.assertIn('2 queries run, the budget is 1', str(failure.exception))
+        self.assertIn('2. SELECT', str(failure.exception))
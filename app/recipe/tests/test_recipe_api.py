@@ -8,13 +8,31 @@ from http import HTTPStatus
 from core.models import Recipe, Tag, Ingredient
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.images import delete_derivatives, generate_derivatives
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from django.conf import settings
+from unittest.mock import patch
 import tempfile
+from io import BytesIO
 import os
 from PIL import Image
+from core import metrics
 
 RECIPE_URL = reverse('recipe:recipe-list')
 
+DERIVATIVES_INLINE = {'SIZES': {'thumbnail': 50, 'medium': 200}, 'QUALITY': 80, 'WORKERS': 0}
+
+# List responses are only cached by default when the cache is shared between workers
+RESPONSE_CACHE_ON = {'ALIAS': 'default', 'TIMEOUT': 300}
+
+UPLOAD_LIMITS = {'MAX_BYTES': 4096, 'MAX_PIXELS': 1_000_000, 'HEADER_BYTES': 1024}
+
+STAGING_DIR = os.path.join(settings.MEDIA_ROOT, 'tmp')
+
 
 def detail_url(recipe):
     return reverse('recipe:recipe-detail', args=(recipe,))
@@ -103,7 +121,7 @@ class RecipePrivateAPITests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_recipes_limited_to_user_success(self):
         """Test: Recipes are retrieved limited to the user"""
@@ -117,7 +135,121 @@ class RecipePrivateAPITests(TestCase):
         recipes = Recipe.objects.all().filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_recipes_paginated_success(self):
+        """Test: Following cursors returns every recipe once from newest to oldest"""
+        recipes = [create_recipe(user=self.user, name=f'Recipe {i}') for i in range(5)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNone(res.data['previous'])
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            ids += [recipe['id'] for recipe in res.data['results']]
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_retrieve_recipes_invalid_cursor_error(self):
+        """Test: Retrieving recipes with a malformed cursor results in error"""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_schema_describes_pagination_success(self):
+        """Test: Generated schema documents cursor pagination of recipe list"""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        parameters = res.json()['paths']['/api/recipe/recipes/']['get']['parameters']
+        names = [parameter['name'] for parameter in parameters]
+        self.assertIn('cursor', names)
+        self.assertIn('page_size', names)
+
+    def test_retrieve_recipes_fixed_query_count_success(self):
+        """Test: Retrieving recipes runs the same number of queries for any number of recipes"""
+        for i in range(10):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(Ingredient.objects.create(user=self.user, name=f'Ingredient {i}'))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(len(res.data['results']), 10)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_recipe_detail_fixed_query_count_success(self):
+        """Test: Retrieving recipe detail prefetches tags and ingredients"""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Salt'))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
+
+    def _create_recipe_with_relations(self):
+        recipe = create_recipe(user=self.user, name='Curry')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Rice'))
+        return recipe
+
+    def test_retrieve_recipes_sparse_fields_skip_relations_success(self):
+        """Test: Requesting only id and name returns those fields with a single query"""
+        recipe = self._create_recipe_with_relations()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {'fields': 'id,name'})
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data['results'], [{'id': recipe.id, 'name': 'Curry'}])
+
+    def test_retrieve_recipes_sparse_fields_relation_ids_success(self):
+        """Test: Relations requested in fields are returned as ids without joining them"""
+        recipe = self._create_recipe_with_relations()
+        tag = recipe.tags.get()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {'fields': 'id,tags'})
+
+        self.assertEqual(res.data['results'], [{'id': recipe.id, 'tags': [tag.id]}])
+
+    def test_retrieve_recipes_expand_relation_success(self):
+        """Test: Expanded relations are returned as nested objects"""
+        recipe = self._create_recipe_with_relations()
+        ingredient = recipe.ingredients.get()
+
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL, {'fields': 'id', 'expand': 'ingredients'})
+
+        self.assertEqual(
+            res.data['results'], [{'id': recipe.id, 'ingredients': [{'id': ingredient.id, 'name': 'Rice'}]}]
+        )
+
+    def test_retrieve_recipe_detail_sparse_fields_success(self):
+        """Test: Recipe detail honours fields and expand"""
+        recipe = self._create_recipe_with_relations()
+        tag = recipe.tags.get()
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'name,price', 'expand': 'tags'})
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data, {'name': 'Curry', 'tags': [{'id': tag.id, 'name': 'Dinner'}], 'price': '228.00'})
+
+    def test_retrieve_recipes_unknown_fields_error(self):
+        """Test: Requesting unknown fields or relations results in error"""
+        for params in ({'fields': 'id,secret'}, {'fields': 'description'}, {'expand': 'user'}):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST, params)
 
     def test_retrieve_recipe_detail_success(self):
         """Test: Detailed recipe returns correct information"""
@@ -192,6 +324,43 @@ class RecipePrivateAPITests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_recipes_with_many_ingredients_fixed_query_count_success(self):
+        """Test: Creating recipes runs the same number of queries for any number of ingredients"""
+        Tag.objects.create(user=self.user, name='Breakfast')
+        Ingredient.objects.create(user=self.user, name='Ingredient 0')
+        query_counts = []
+        for count in (3, 30):
+            payload = {
+                'name': 'Dish',
+                'time_minutes': 5,
+                'tags': [{'name': 'Breakfast'}],
+                'ingredients': [{'name': f'Ingredient {i}'} for i in range(count)],
+            }
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(RECIPE_URL, payload, format='json')
+            self.assertEqual(res.status_code, HTTPStatus.CREATED)
+            query_counts.append(len(queries))
+
+            recipe = Recipe.objects.get(id=res.data['id'])
+            self.assertEqual(recipe.ingredients.count(), count)
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 30)
+
+    def test_create_recipes_with_repeated_tags_success(self):
+        """Test: Repeating a tag name in one request links a single tag"""
+        payload = {
+            'name': 'Dish',
+            'time_minutes': 5,
+            'tags': [{'name': 'Breakfast'}, {'name': 'Breakfast'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+        self.assertEqual(Tag.objects.filter(user=self.user, name='Breakfast').count(), 1)
+
     def test_update_recipes_with_created_tags(self):
         """Test: Updating recipes with tags results in success"""
         payload = {
@@ -220,6 +389,47 @@ class RecipePrivateAPITests(TestCase):
         self.assertIn(tag_lunch, recipe.tags.all())
         self.assertNotIn(tag_breakfast, recipe.tags.all())
 
+    def test_update_recipes_keeps_unchanged_tags_success(self):
+        """Test: Updating tags only deletes and inserts links that changed"""
+        tag_breakfast = Tag.objects.create(user=self.user, name='Breakfast')
+        tag_lunch = Tag.objects.create(user=self.user, name='Lunch')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_breakfast, tag_lunch)
+        link = Recipe.tags.through.objects.get(recipe=recipe, tag=tag_breakfast)
+
+        payload = {'tags': [{'name': 'Breakfast'}, {'name': 'Dinner'}]}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), payload, format='json')
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        statements = [query['sql'] for query in queries if 'core_recipe_tags' in query['sql']]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('DELETE')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT')]), 1)
+
+        self.assertTrue(Recipe.tags.through.objects.filter(id=link.id).exists())
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Breakfast', 'Dinner'},
+        )
+
+    def test_update_recipes_with_same_tags_no_writes_success(self):
+        """Test: Updating recipes with already linked tags writes no links"""
+        tag_breakfast = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_breakfast)
+
+        payload = {'tags': [{'name': 'Breakfast'}]}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), payload, format='json')
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        writes = [
+            query['sql'] for query in queries
+            if 'core_recipe_tags' in query['sql'] and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(list(recipe.tags.all()), [tag_breakfast])
+
     def test_create_recipes_with_ingredients_success(self):
         """Test: Creating recipes with ingredients results in success"""
         res = self.client.post(RECIPE_URL, self.payload_ingredient, format='json')
@@ -311,6 +521,33 @@ class RecipePrivateAPITests(TestCase):
         recipe.refresh_from_db()
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    def test_full_update_recipe_with_tag_ids_success(self):
+        """Test: Replacing a recipe links the tags and ingredients given by id"""
+        recipe = create_recipe(self.user)
+        tags = [Tag.objects.create(user=self.user, name=name) for name in ('Vegan', 'Quick')]
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = {
+            'name': 'Stew', 'time_minutes': 20, 'price': '3.00',
+            'tags': [tags[1].id, str(tags[0].id)], 'ingredients': [salt.id],
+        }
+        res = self.client.put(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(sorted(res.data['tags']), sorted(tag.id for tag in tags))
+        self.assertEqual(set(recipe.tags.all()), set(tags))
+        self.assertEqual(list(recipe.ingredients.all()), [salt])
+
+    def test_full_update_recipe_with_invalid_tag_ids_error(self):
+        """Test: Replacing a recipe with unknown or malformed tag ids results in error"""
+        recipe = create_recipe(self.user)
+        for tags, message in (([999999], 'Invalid pk "999999"'), (['abc'], 'Incorrect type'), ('1', 'Expected a list')):
+            with self.subTest(tags=tags):
+                payload = {'name': 'Stew', 'time_minutes': 20, 'price': '3.00', 'tags': tags}
+                res = self.client.put(detail_url(recipe.id), payload, format='json')
+
+                self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+                self.assertIn(message, str(res.data['tags'][0]))
+
     def test_filter_recipes_by_tags_success(self):
         """Test: Filtering recipes by tags results in success"""
         recipe1 = create_recipe(user=self.user, name='Pasta')
@@ -328,9 +565,9 @@ class RecipePrivateAPITests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients_success(self):
         """Test: Filtering recipes by ingredients results in success"""
@@ -349,9 +586,228 @@ class RecipePrivateAPITests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_recipes_matching_all_tags_and_ingredients_success(self):
+        """Test: Filtering with match=all returns recipes having every given tag and ingredient"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        both = create_recipe(user=self.user, name='Both')
+        both.tags.add(vegan, quick)
+        both.ingredients.add(rice)
+        only_vegan = create_recipe(user=self.user, name='Only vegan')
+        only_vegan.tags.add(vegan)
+        only_vegan.ingredients.add(rice)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{vegan.id},{quick.id}', 'match': 'all'})
+        self.assertEqual([recipe['id'] for recipe in res.data['results']], [both.id])
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{vegan.id},{quick.id}'})
+        self.assertEqual([recipe['id'] for recipe in res.data['results']], [only_vegan.id, both.id])
+
+        res = self.client.get(RECIPE_URL, {'tags': str(vegan.id), 'ingredients': str(rice.id), 'match': 'all'})
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_filter_recipes_matching_all_after_update_success(self):
+        """Test: Recipes updated through the API are matched by their new tags"""
+        recipe = create_recipe(user=self.user)
+        self.client.patch(detail_url(recipe.id), {'tags': [{'name': 'Spicy'}], 'name': 'Hot'}, format='json')
+        spicy = Tag.objects.get(user=self.user, name='Spicy')
+
+        res = self.client.get(RECIPE_URL, {'tags': str(spicy.id), 'match': 'all'})
+        self.assertEqual([item['id'] for item in res.data['results']], [recipe.id])
+
+        res = self.client.get(RECIPE_URL, {'match': 'most'})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_filter_recipes_by_time_and_price_success(self):
+        """Test: Filtering recipes by time and price ranges results in success"""
+        quick_cheap = create_recipe(user=self.user, time_minutes=20, price=Decimal('5.00'))
+        create_recipe(user=self.user, time_minutes=45, price=Decimal('5.00'))
+        create_recipe(user=self.user, time_minutes=20, price=Decimal('15.00'))
+        quicker_cheaper = create_recipe(user=self.user, time_minutes=10, price=Decimal('2.50'))
+
+        res = self.client.get(RECIPE_URL, {'max_time': 30, 'max_price': '10'})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual([recipe['id'] for recipe in res.data['results']], [quicker_cheaper.id, quick_cheap.id])
+
+        res = self.client.get(RECIPE_URL, {'min_time': 15, 'min_price': '4.99', 'max_price': '5.00'})
+        self.assertEqual([recipe['id'] for recipe in res.data['results']][-1], quick_cheap.id)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_order_recipes_by_price_paginated_success(self):
+        """Test: Following cursors of recipes ordered by price returns each recipe once"""
+        prices = ['3.00', '1.00', '2.00', '1.00', '3.00']
+        recipes = [create_recipe(user=self.user, price=Decimal(price)) for price in prices]
+        expected = [recipe.id for recipe in sorted(recipes, key=lambda recipe: (recipe.price, recipe.id))]
+
+        for ordering, order in (('price', expected), ('-price', expected[::-1])):
+            res = self.client.get(RECIPE_URL, {'ordering': ordering, 'page_size': 2})
+            ids = [recipe['id'] for recipe in res.data['results']]
+            while res.data['next']:
+                res = self.client.get(res.data['next'])
+                ids += [recipe['id'] for recipe in res.data['results']]
+            self.assertEqual(ids, order)
+
+    def test_order_recipes_by_time_success(self):
+        """Test: Ordering recipes by preparation time results in success"""
+        slow = create_recipe(user=self.user, time_minutes=60)
+        quick = create_recipe(user=self.user, time_minutes=5)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL, {'ordering': 'time_minutes', 'page_size': 1})
+        self.assertEqual([recipe['id'] for recipe in res.data['results']], [quick.id])
+        res = self.client.get(res.data['next'])
+        self.assertEqual([recipe['id'] for recipe in res.data['results']], [slow.id])
+
+    def test_filter_recipes_invalid_params_error(self):
+        """Test: Invalid range or ordering parameters result in error"""
+        for params in ({'max_time': 'soon'}, {'min_price': '-1'}, {'ordering': 'name'},
+                       {'min_time': 30, 'max_time': 10}):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST, params)
+
+    def test_detail_ignores_list_params_success(self):
+        """Test: List filters neither fail nor narrow retrieving and updating a recipe"""
+        recipe = create_recipe(user=self.user, time_minutes=20, price=Decimal('5.00'))
+
+        res = self.client.get(detail_url(recipe.id), {'min_time': 'x', 'max_price': '1', 'ordering': 'bogus'})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        res = self.client.patch(f'{detail_url(recipe.id)}?ordering=bogus&min_time=30', {'name': 'Stew'})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Stew')
+
+    def test_schema_describes_range_filters_success(self):
+        """Test: Generated schema documents range filters and ordering of recipe list"""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+
+        parameters = res.json()['paths']['/api/recipe/recipes/']['get']['parameters']
+        names = {parameter['name']: parameter for parameter in parameters}
+        for name in ('min_time', 'max_time', 'min_price', 'max_price', 'ordering'):
+            self.assertIn(name, names)
+        self.assertIn('-price', names['ordering']['schema']['enum'])
+
+    def test_search_recipes_ranked_success(self):
+        """Test: Searching recipes returns matches with name matches ranked first"""
+        in_description = create_recipe(user=self.user, name='Breakfast', description='Fluffy pancakes with syrup')
+        in_name = create_recipe(user=self.user, name='Pancakes', description='Served with syrup')
+        create_recipe(user=self.user, name='Fish and Chips', description='Crispy')
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        create_recipe(user=other_user, name='Pancake')
+
+        res = self.client.get(RECIPE_URL, {'search': 'pancake'})
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual([recipe['id'] for recipe in res.data['results']], [in_name.id, in_description.id])
+
+    def test_search_recipes_websearch_syntax_success(self):
+        """Test: Search supports quoted phrases and excluded words"""
+        create_recipe(user=self.user, name='Tomato soup', description='Hot')
+        cold = create_recipe(user=self.user, name='Tomato salad', description='Cold')
+
+        res = self.client.get(RECIPE_URL, {'search': 'tomato -soup'})
+
+        self.assertEqual([recipe['id'] for recipe in res.data['results']], [cold.id])
+
+    def test_search_recipes_sees_updates_success(self):
+        """Test: Editing a recipe's description updates what search finds"""
+        recipe = create_recipe(user=self.user, name='Stew', description='Beef')
+        recipe.description = 'Lentils'
+        recipe.save()
+
+        res = self.client.get(RECIPE_URL, {'search': 'lentil'})
+        self.assertEqual([item['id'] for item in res.data['results']], [recipe.id])
+        res = self.client.get(RECIPE_URL, {'search': 'beef'})
+        self.assertEqual(res.data['results'], [])
+
+    def test_search_recipes_paginated_success(self):
+        """Test: Paging through ranked search results returns every match once"""
+        for number in range(3):
+            create_recipe(user=self.user, name=f'Curry {number}', description='Spicy')
+            create_recipe(user=self.user, name=f'Rice {number}', description='Curry on the side')
+
+        ids, url, params = [], RECIPE_URL, {'search': 'curry', 'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            ids += [recipe['id'] for recipe in res.data['results']]
+            url, params = res.data['next'], None
+
+        names = [Recipe.objects.get(id=recipe_id).name for recipe_id in ids]
+        self.assertEqual(len(set(ids)), 6)
+        self.assertTrue(all(name.startswith('Curry') for name in names[:3]))
+
+    @override_settings(RESPONSE_CACHE=RESPONSE_CACHE_ON)
+    def test_retrieve_recipes_cached_success(self):
+        """Test: Repeating a list request is served without queries"""
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL)
+        self.assertEqual(second.status_code, HTTPStatus.OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    @override_settings(RESPONSE_CACHE=RESPONSE_CACHE_ON)
+    def test_retrieve_recipes_cache_invalidated_by_writes_success(self):
+        """Test: Writing recipes or their tags changes the cached list"""
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+
+        create_recipe(user=self.user, name='Second')
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 2)
+
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][1]['tags'], [{'id': tag.id, 'name': 'Dinner'}])
+
+        tag.name = 'Supper'
+        tag.save()
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][1]['tags'], [{'id': tag.id, 'name': 'Supper'}])
+
+    @override_settings(RESPONSE_CACHE=RESPONSE_CACHE_ON)
+    def test_retrieve_recipes_cache_per_query_and_user_success(self):
+        """Test: Cached lists are kept apart by query string and user"""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag)
+        create_recipe(user=self.user, name='Untagged')
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 2)
+        res = self.client.get(RECIPE_URL, {'tags': tag.id})
+        self.assertEqual(len(res.data['results']), 1)
+
+        other_user = get_user_model().objects.create_user('other@example.com', 'password123')
+        self.client.force_authenticate(other_user)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'], [])
+
+    @override_settings(RESPONSE_CACHE=RESPONSE_CACHE_ON)
+    def test_retrieve_recipes_not_modified_success(self):
+        """Test: Sending back the ETag of an unchanged list results in 304"""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertNotEqual(res['ETag'], etag)
 
 
 class ImageUploadTest(TestCase):
@@ -364,8 +820,72 @@ class ImageUploadTest(TestCase):
         self.recipe = create_recipe(self.user)
 
     def tearDown(self) -> None:
+        self.recipe.refresh_from_db()
+        delete_derivatives(self.recipe.image_derivatives)
         self.recipe.image.delete()
 
+    def _upload_image(self, size=(10, 10)):
+        """Uploading a generated JPEG and running on-commit callbacks"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', size).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(url, {'image': image_file}, format='multipart')
+
+    @override_settings(RECIPE_IMAGE_DERIVATIVES=DERIVATIVES_INLINE)
+    def test_upload_image_generates_derivatives(self):
+        """Test: Uploading images records resized copies of every size"""
+        res = self._upload_image(size=(1000, 500))
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        self.recipe.refresh_from_db()
+        derivatives = self.recipe.image_derivatives
+        self.assertEqual(set(derivatives), set(DERIVATIVES_INLINE['SIZES']))
+        for label, size in DERIVATIVES_INLINE['SIZES'].items():
+            self.assertIn('jpeg', derivatives[label])
+            for name in derivatives[label].values():
+                with default_storage.open(name) as derivative, Image.open(derivative) as image:
+                    self.assertEqual(image.size, (size, size // 2))
+
+        res = self.client.get(detail_url(self.recipe.id))
+        url = res.data['image_derivatives']['thumbnail']['jpeg']
+        self.assertTrue(url.startswith('http://testserver/static/media/uploads/recipe/derivatives/'))
+
+    @override_settings(RECIPE_IMAGE_DERIVATIVES=DERIVATIVES_INLINE)
+    def test_upload_image_replaces_derivatives(self):
+        """Test: Uploading another image deletes derivatives of the previous one"""
+        self._upload_image()
+        self.recipe.refresh_from_db()
+        previous = self.recipe.image_derivatives
+        previous_image = self.recipe.image.name
+
+        self._upload_image()
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image_derivatives, previous)
+        for formats in previous.values():
+            for name in formats.values():
+                self.assertFalse(default_storage.exists(name))
+        default_storage.delete(previous_image)
+
+    @override_settings(RECIPE_IMAGE_DERIVATIVES=DERIVATIVES_INLINE)
+    def test_derivatives_of_replaced_image_discarded(self):
+        """Test: Derivatives finished after the image was replaced are not recorded"""
+        self._upload_image()
+        self.recipe.refresh_from_db()
+        image_name = self.recipe.image.name
+        delete_derivatives(self.recipe.image_derivatives)
+        Recipe.objects.filter(id=self.recipe.id).update(image='uploads/recipe/other.jpg', image_derivatives={})
+
+        with patch('recipe.images.delete_derivatives') as patched_delete:
+            generate_derivatives(self.recipe.id, image_name)
+        patched_delete.assert_called_once()
+        delete_derivatives(patched_delete.call_args[0][0])
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_derivatives, {})
+        default_storage.delete(image_name)
+
     def test_upload_image_to_recipe(self):
         """Test: Uploading images to recipe results in success"""
         url = image_upload_url(self.recipe.id)
@@ -388,4 +908,79 @@ class ImageUploadTest(TestCase):
         res = self.client.post(url, payload, format='multipart')
         self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
 
+    def _post_file(self, content, suffix='.jpg'):
+        """Uploading raw bytes as the image file"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=suffix) as upload:
+            upload.write(content)
+            upload.seek(0)
+            return self.client.post(url, {'image': upload}, format='multipart')
+
+    def _staged_files(self):
+        return set(os.listdir(STAGING_DIR)) if os.path.isdir(STAGING_DIR) else set()
+
+    @override_settings(RECIPE_IMAGE_UPLOAD=UPLOAD_LIMITS)
+    def test_upload_oversize_image_error(self):
+        """Test: Uploading images over the size limit results in error"""
+        buffer = BytesIO()
+        Image.effect_noise((200, 200), 100).save(buffer, format='PNG')
+        staged = self._staged_files()
+
+        res = self._post_file(buffer.getvalue(), suffix='.png')
+
+        self.assertEqual(res.status_code, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        self.assertEqual(self._staged_files(), staged)
+
+    def test_upload_non_image_error(self):
+        """Test: Uploading files that are not images results in error"""
+        res = self._post_file(b'GIF89 is not enough, this is plain text')
+
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('image', res.data)
+
+    @override_settings(RECIPE_IMAGE_UPLOAD=UPLOAD_LIMITS)
+    def test_upload_decompression_bomb_error(self):
+        """Test: Images over the pixel limit are rejected without decoding them"""
+        buffer = BytesIO()
+        Image.new('1', (2000, 2000)).save(buffer, format='PNG')
+        staged = self._staged_files()
+
+        with patch('PIL.ImageFile.ImageFile.load') as patched_load:
+            res = self._post_file(buffer.getvalue(), suffix='.png')
 
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('image', res.data)
+        patched_load.assert_not_called()
+        self.assertEqual(self._staged_files(), staged)
+
+    def test_upload_size_recorded(self):
+        """Test: Sizes of accepted uploads are recorded in the metrics"""
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='JPEG')
+        metrics.clear()
+
+        res = self._post_file(buffer.getvalue())
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        counts = metrics.UPLOAD_SIZE.values[()]
+        self.assertEqual(sum(counts[:-1]), 1)
+        self.assertEqual(counts[-1], len(buffer.getvalue()))
+
+    @override_settings(RECIPE_IMAGE_UPLOAD=UPLOAD_LIMITS)
+    def test_upload_rejection_recorded(self):
+        """Test: Rejected uploads are counted by reason"""
+        metrics.clear()
+        self._post_file(b'GIF89 is not enough, this is plain text')
+        self._post_file(b'\xff\xd8\xff' + b'0' * 8192)
+
+        self.assertEqual(metrics.UPLOADS_REJECTED.values, {('invalid',): 1, ('too_large',): 1})
+
+    def test_upload_image_staged_under_media_root(self):
+        """Test: Uploaded images are streamed to a temporary file under MEDIA_ROOT"""
+        with patch('recipe.uploads.tempfile.NamedTemporaryFile', wraps=tempfile.NamedTemporaryFile) as patched:
+            res = self._upload_image()
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(patched.call_args.kwargs['dir'], STAGING_DIR)
@@ -0,0 +1,249 @@
+"""
+Tests for bulk import of recipes
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.tests.test_recipe_api import RESPONSE_CACHE_ON
+
+RECIPE_URL = reverse('recipe:recipe-list')
+BULK_IMPORT_URL = reverse('recipe:recipe-bulk-import')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def recipe_row(number, **kwargs):
+    row = {
+        'name': f'Recipe {number}',
+        'time_minutes': 10,
+        'price': '5.50',
+        'tags': [{'name': 'Dinner'}],
+        'ingredients': [{'name': f'Ingredient {number}'}, {'name': 'Salt'}],
+    }
+    row.update(kwargs)
+    return row
+
+
+class RecipeBulkImportTests(TestCase):
+    """Tests for the recipe bulk import API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def test_authentication_required_for_bulk_import_error(self):
+        """Test: Bulk importing recipes without authentication results in error"""
+        res = APIClient().post(BULK_IMPORT_URL, [recipe_row(1)], format='json')
+
+        self.assertEqual(res.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_bulk_import_json_array_success(self):
+        """Test: Importing a JSON array creates recipes with their tags and ingredients"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        res = self.client.post(BULK_IMPORT_URL, [recipe_row(1), recipe_row(2)], format='json')
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 0)
+        for index, row in enumerate(res.data['rows']):
+            recipe = Recipe.objects.get(id=row['id'], user=self.user)
+            self.assertEqual(row['index'], index)
+            self.assertEqual(recipe.name, f'Recipe {index + 1}')
+            self.assertEqual(recipe.price, Decimal('5.50'))
+            self.assertEqual([tag.name for tag in recipe.tags.all()], ['Dinner'])
+            self.assertEqual(
+                sorted(ingredient.name for ingredient in recipe.ingredients.all()),
+                sorted([f'Ingredient {index + 1}', 'Salt'])
+            )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Ingredient.objects.filter(user=self.user, name='Salt').count(), 1)
+
+    def test_bulk_import_json_lines_success(self):
+        """Test: Importing JSON Lines creates a recipe per line"""
+        body = '\n'.join(json.dumps(recipe_row(number)) for number in range(3)) + '\n\n'
+        res = self.client.post(BULK_IMPORT_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data['created'], 3)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_import_invalid_json_line_error(self):
+        """Test: Malformed JSON Lines are rejected as a whole"""
+        body = json.dumps(recipe_row(1)) + '\n{not json\n'
+        res = self.client.post(BULK_IMPORT_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('line 2', res.data['detail'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_import_reports_invalid_rows_success(self):
+        """Test: Invalid rows are reported while valid rows are still created"""
+        rows = [recipe_row(1), recipe_row(2, time_minutes='soon'), 'not a recipe', recipe_row(4)]
+        res = self.client.post(BULK_IMPORT_URL, rows, format='json')
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual([row['index'] for row in res.data['rows']], [0, 1, 2, 3])
+        self.assertIn('time_minutes', res.data['rows'][1]['errors'])
+        self.assertIn('non_field_errors', res.data['rows'][2]['errors'])
+        self.assertEqual(
+            sorted(Recipe.objects.filter(user=self.user).values_list('name', flat=True)),
+            ['Recipe 1', 'Recipe 4']
+        )
+
+    def test_bulk_import_repeated_tags_in_row_success(self):
+        """Test: Repeating a tag within one row links it once"""
+        res = self.client.post(
+            BULK_IMPORT_URL, [recipe_row(1, tags=[{'name': 'Dinner'}, {'name': 'Dinner'}])], format='json'
+        )
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        recipe = Recipe.objects.get(id=res.data['rows'][0]['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+
+    def test_bulk_import_not_a_list_error(self):
+        """Test: Bulk importing anything but a list results in error"""
+        res = self.client.post(BULK_IMPORT_URL, recipe_row(1), format='json')
+
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+    @override_settings(RECIPE_BULK_IMPORT={'CHUNK_SIZE': 500, 'MAX_ROWS': 2})
+    def test_bulk_import_too_many_rows_error(self):
+        """Test: Bulk importing more rows than allowed results in error"""
+        res = self.client.post(BULK_IMPORT_URL, [recipe_row(number) for number in range(3)], format='json')
+
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_import_fixed_query_count_success(self):
+        """Test: Importing runs the same number of queries for any number of rows in a chunk"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        Ingredient.objects.create(user=self.user, name='Salt')
+        query_counts = []
+        for count in (2, 40):
+            rows = [recipe_row(f'{count}-{number}') for number in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BULK_IMPORT_URL, rows, format='json')
+            self.assertEqual(res.data['created'], count)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    @override_settings(RECIPE_BULK_IMPORT={'CHUNK_SIZE': 2, 'MAX_ROWS': 100})
+    def test_bulk_import_in_chunks_success(self):
+        """Test: Rows spanning several chunks are all created in order"""
+        res = self.client.post(BULK_IMPORT_URL, [recipe_row(number) for number in range(5)], format='json')
+
+        self.assertEqual(res.data['created'], 5)
+        ids = [row['id'] for row in res.data['rows']]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    @override_settings(RESPONSE_CACHE=RESPONSE_CACHE_ON)
+    def test_bulk_import_invalidates_cached_list_success(self):
+        """Test: Recipes list shows imported recipes right away"""
+        self.client.get(RECIPE_URL)
+        self.client.post(BULK_IMPORT_URL, [recipe_row(1)], format='json')
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual([recipe['name'] for recipe in res.data['results']], ['Recipe 1'])
+
+
+class RecipeExportTests(TestCase):
+    """Tests for the recipe export API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count, user=None):
+        user = user or self.user
+        dinner, _ = Tag.objects.get_or_create(user=user, name='Dinner')
+        salt, _ = Ingredient.objects.get_or_create(user=user, name='Salt')
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(user=user, name=f'Recipe {number}', time_minutes=5, price=Decimal('2.50'))
+            recipe.tags.add(dinner)
+            recipe.ingredients.add(salt)
+            recipes.append(recipe)
+        return recipes
+
+    def _export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertTrue(res.streaming)
+        return b''.join(res.streaming_content).decode()
+
+    def test_authentication_required_for_export_error(self):
+        """Test: Exporting recipes without authentication results in error"""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_export_ndjson_success(self):
+        """Test: Exporting streams a JSON document per recipe of the user"""
+        recipes = self._create_recipes(3)
+        self._create_recipes(1, user=get_user_model().objects.create_user(email='other@example.com'))
+
+        rows = [json.loads(line) for line in self._export().splitlines()]
+
+        self.assertEqual([row['id'] for row in rows], [recipe.id for recipe in recipes])
+        self.assertEqual(rows[0]['price'], '2.50')
+        self.assertEqual(rows[0]['tags'], ['Dinner'])
+        self.assertEqual(rows[0]['ingredients'], ['Salt'])
+        self.assertEqual(rows[0]['image'], '')
+
+    def test_export_csv_success(self):
+        """Test: Exporting as CSV joins tags and ingredients with semicolons"""
+        recipe = self._create_recipes(1)[0]
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Quick'))
+
+        rows = list(csv.DictReader(io.StringIO(self._export(export_format='csv'))))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(recipe.id))
+        self.assertEqual(rows[0]['tags'], 'Dinner;Quick')
+        self.assertEqual(rows[0]['price'], '2.50')
+
+    def test_export_unknown_format_error(self):
+        """Test: Exporting in an unknown format results in error"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+    @override_settings(RECIPE_EXPORT={'CHUNK_SIZE': 100})
+    def test_export_fixed_query_count_success(self):
+        """Test: Exporting runs the same number of queries for any number of recipes in a batch"""
+        query_counts = []
+        for count in (2, 20):
+            Recipe.objects.all().delete()
+            self._create_recipes(count)
+            with CaptureQueriesContext(connection) as queries:
+                lines = self._export().splitlines()
+            self.assertEqual(len(lines), count)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    @override_settings(RECIPE_EXPORT={'CHUNK_SIZE': 2})
+    def test_export_in_batches_success(self):
+        """Test: Recipes spanning several batches are all exported once"""
+        recipes = self._create_recipes(5)
+
+        rows = [json.loads(line) for line in self._export().splitlines()]
+
+        self.assertEqual([row['id'] for row in rows], [recipe.id for recipe in recipes])
+        self.assertTrue(all(row['tags'] == ['Dinner'] for row in rows))
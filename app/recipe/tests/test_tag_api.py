@@ -1,16 +1,17 @@
 """
 Tests for Tag API
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from http import HTTPStatus
 from core.models import Tag, Recipe
 from recipe.serializers import TagSerializer
-from recipe.tests.test_recipe_api import create_recipe
+from recipe.tests.test_recipe_api import RESPONSE_CACHE_ON, create_recipe
 
 TAG_URL_LIST = reverse('recipe:tag-list')
+TAG_TYPEAHEAD_URL = reverse('recipe:tag-typeahead')
 
 
 def tag_url(tag):
@@ -59,7 +60,7 @@ class TagPrivateAPITest(TestCase):
         self.assertTrue(tags)
 
         serializer = TagSerializer(tags, many=True)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tag_list_only_for_creators_success(self):
         """Test: Tags are retrieved only for their creators"""
@@ -68,11 +69,11 @@ class TagPrivateAPITest(TestCase):
         create_tag('Cheap', user1)
         res = self.client.get(TAG_URL_LIST)
         self.assertEqual(res.status_code, HTTPStatus.OK)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
 
         tags = Tag.objects.filter(user=self.user.id)
         serializer = TagSerializer(tags, many=True)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tag_update_success(self):
         """Test: Updating tags results in success"""
@@ -86,6 +87,29 @@ class TagPrivateAPITest(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, self.payload_tag['name'])
 
+    def test_tag_update_existing_name_error(self):
+        """Test: Renaming a tag to a name the user already has results in error"""
+        create_tag('Breakfast', self.user)
+        tag = create_tag('Vegan', self.user)
+
+        res = self.client.patch(tag_url(tag.id), {'name': 'Breakfast'})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Vegan')
+
+    @override_settings(RESPONSE_CACHE=RESPONSE_CACHE_ON)
+    def test_tag_list_cache_invalidated_by_update_success(self):
+        """Test: Renaming a tag changes the cached tag list"""
+        tag = create_tag('Vegan', self.user)
+        res = self.client.get(TAG_URL_LIST)
+        etag = res['ETag']
+
+        self.client.patch(tag_url(tag.id), {'name': 'Vegetarian'})
+        res = self.client.get(TAG_URL_LIST, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data['results'], [{'id': tag.id, 'name': 'Vegetarian'}])
+
     def test_tag_delete_success(self):
         """Test: Deleting tags results in success"""
         tag = create_tag('Vegan', self.user)
@@ -109,23 +133,86 @@ class TagPrivateAPITest(TestCase):
 
         ser1 = TagSerializer(tag1)
         ser2 = TagSerializer(tag2)
-        self.assertIn(ser1.data, res.data)
-        self.assertNotIn(ser2.data, res.data)
+        self.assertIn(ser1.data, res.data['results'])
+        self.assertNotIn(ser2.data, res.data['results'])
 
         res = self.client.get(TAG_URL_LIST, {'assigned_only': 0})
         self.assertEqual(res.status_code, HTTPStatus.OK)
-        self.assertIn(ser1.data, res.data)
-        self.assertIn(ser2.data, res.data)
+        self.assertIn(ser1.data, res.data['results'])
+        self.assertIn(ser2.data, res.data['results'])
 
     def test_filter_tags_only_unique_success(self):
         """Test: Filtering tags returns only unique ones"""
         tag1 = Tag.objects.create(name='Easy', user=self.user)
-        tag2 = Tag.objects.create(name='Easy', user=self.user)
+        tag2 = Tag.objects.create(name='Cheap', user=self.user)
         recipe1 = create_recipe(self.user)
         recipe2 = create_recipe(self.user)
         recipe1.tags.add(tag1)
-        recipe2.tags.add(tag2)
+        recipe2.tags.add(tag1, tag2)
 
         res = self.client.get(TAG_URL_LIST, {'assigned_only': 1})
         self.assertEqual(res.status_code, HTTPStatus.OK)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_typeahead_tags_prefix_first_success(self):
+        """Test: Typeahead returns prefix matches first, then similar names"""
+        for name in ('Chickpea', 'Chicken', 'Rich chicken', 'Dessert'):
+            create_tag(name, self.user)
+        create_tag('Chili', create_user(email='other@example.com'))
+
+        res = self.client.get(TAG_TYPEAHEAD_URL, {'q': 'chick'})
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        names = [tag['name'] for tag in res.data]
+        self.assertEqual(names[:2], ['Chicken', 'Chickpea'])
+        self.assertNotIn('Dessert', names)
+        self.assertNotIn('Chili', names)
+
+    def test_typeahead_tags_tolerates_typos_success(self):
+        """Test: Typeahead finds names spelled slightly differently"""
+        tag = create_tag('Vegetarian', self.user)
+
+        res = self.client.get(TAG_TYPEAHEAD_URL, {'q': 'vegitarian'})
+
+        self.assertEqual(res.data, [TagSerializer(tag).data])
+
+    def test_typeahead_tags_limit_success(self):
+        """Test: Typeahead returns at most limit matches"""
+        for number in range(5):
+            create_tag(f'Soup {number}', self.user)
+
+        res = self.client.get(TAG_TYPEAHEAD_URL, {'q': 'soup', 'limit': 3})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Soup 0', 'Soup 1', 'Soup 2'])
+
+    def test_typeahead_tags_escapes_pattern_success(self):
+        """Test: Regular expression characters in the query match literally"""
+        tag = create_tag('C++ night', self.user)
+        create_tag('Cake', self.user)
+
+        res = self.client.get(TAG_TYPEAHEAD_URL, {'q': 'c++'})
+
+        self.assertEqual(res.data[0], TagSerializer(tag).data)
+
+    def test_typeahead_tags_empty_query_success(self):
+        """Test: Typeahead without a query returns no matches"""
+        create_tag('Easy', self.user)
+
+        res = self.client.get(TAG_TYPEAHEAD_URL)
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data, [])
+
+    def test_typeahead_tags_cache_headers_success(self):
+        """Test: Typeahead responses may be reused privately for a short time"""
+        res = self.client.get(TAG_TYPEAHEAD_URL, {'q': 'easy'})
+
+        self.assertIn('private', res['Cache-Control'])
+        self.assertIn('max-age=30', res['Cache-Control'])
+        self.assertIn('Authorization', res['Vary'])
+
+    def test_typeahead_tags_invalid_limit_error(self):
+        """Test: Typeahead with a limit that is not a number results in error"""
+        res = self.client.get(TAG_TYPEAHEAD_URL, {'q': 'easy', 'limit': 'many'})
+
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
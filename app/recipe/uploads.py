@@ -0,0 +1,154 @@
+"""
+Streaming of recipe image uploads
+
+Uploaded images are written chunk by chunk to a temporary file under
+MEDIA_ROOT, so saving them to storage is a rename rather than a copy.
+Format and dimensions are read from the header as it arrives, letting
+oversize files and decompression bombs be rejected before the rest of the
+body is read or any pixel is decoded.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser, MultiPartParserError
+from django.utils.translation import gettext_lazy as _
+from http import HTTPStatus
+from PIL import Image
+from rest_framework.exceptions import APIException, ParseError, ValidationError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+from core import metrics
+
+SIGNATURES = (
+    b'\xff\xd8\xff',
+    b'\x89PNG\r\n\x1a\n',
+    b'GIF87a',
+    b'GIF89a',
+)
+
+# Multipart boundaries and form fields sent along with the image
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class ImageTooLarge(APIException):
+    status_code = HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Uploaded image is too large.')
+    default_code = 'image_too_large'
+
+
+def _is_image_signature(header):
+    """Checking magic bytes of the supported image formats"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return True
+    return header.startswith(SIGNATURES)
+
+
+class StagedUploadedFile(TemporaryUploadedFile):
+    """Uploaded file staged in a temporary file under MEDIA_ROOT"""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        directory = os.path.join(settings.MEDIA_ROOT, 'tmp')
+        os.makedirs(directory, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=directory)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+
+
+class CappedImageUploadHandler(FileUploadHandler):
+    """Upload handler streaming images to disk and rejecting them as early as possible"""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        """Rejecting bodies that announce more bytes than allowed"""
+        if content_length > settings.RECIPE_IMAGE_UPLOAD['MAX_BYTES'] + MULTIPART_OVERHEAD:
+            metrics.UPLOADS_REJECTED.inc(reason='too_large')
+            raise ImageTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = StagedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.received = 0
+        self.inspected = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.RECIPE_IMAGE_UPLOAD['MAX_BYTES']:
+            self._reject(ImageTooLarge())
+        self.file.write(raw_data)
+        if not self.inspected:
+            self.inspected = self._inspect(complete=False)
+
+    def file_complete(self, file_size):
+        if not self.inspected:
+            self._inspect(complete=True)
+        self.file.seek(0)
+        self.file.size = file_size
+        metrics.UPLOAD_SIZE.observe(file_size)
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self._discard()
+
+    def _inspect(self, complete):
+        """Checking format and dimensions from the bytes received so far"""
+        options = settings.RECIPE_IMAGE_UPLOAD
+        partial = not complete and self.received < options['HEADER_BYTES']
+        self.file.flush()
+        self.file.seek(0)
+        header = self.file.read(12)
+        if len(header) < 12 and partial:
+            self.file.seek(0, os.SEEK_END)
+            return False
+        if not _is_image_signature(header):
+            self._reject(ValidationError({'image': [_('Upload a valid image.')]}))
+
+        self.file.seek(0)
+        try:
+            # Opening an image only parses its header, pixels are decoded lazily
+            with Image.open(self.file.file) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = None
+        except Exception:
+            if partial:
+                self.file.seek(0, os.SEEK_END)
+                return False
+            self._reject(ValidationError({'image': [_('Upload a valid image.')]}))
+
+        if width is None or width * height > options['MAX_PIXELS']:
+            self._reject(ValidationError({'image': [_('Image dimensions are too large.')]}))
+        self.file.seek(0, os.SEEK_END)
+        return True
+
+    def _reject(self, exc):
+        metrics.UPLOADS_REJECTED.inc(reason='too_large' if isinstance(exc, ImageTooLarge) else 'invalid')
+        self._discard()
+        raise exc
+
+    def _discard(self):
+        try:
+            self.file.close()
+        except FileNotFoundError:
+            pass
+
+
+class ImageUploadParser(MultiPartParser):
+    """Parser: Multipart form with an image streamed through CappedImageUploadHandler"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        upload_handlers = [CappedImageUploadHandler(request)]
+
+        try:
+            parser = DjangoMultiPartParser(meta, stream, upload_handlers, encoding)
+            data, files = parser.parse()
+            return DataAndFiles(data, files)
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
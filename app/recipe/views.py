@@ -1,17 +1,54 @@
+import re
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework import mixins
+from recipe.cache import CachedListMixin
+from recipe.fastpath import FastListMixin
+from recipe.images import delete_derivatives, schedule_derivatives
+from recipe.bulk import export_csv, export_ndjson, import_recipes
+from recipe.parsers import JSONLinesParser
+from recipe.uploads import ImageUploadParser
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer, IngredientSerializer, \
-    ImageSerializer
-from rest_framework.authentication import TokenAuthentication
+    ImageSerializer, RecipeImportSerializer, RecipeFilterSerializer, RECIPE_ORDERINGS
+from user.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, Tag, Ingredient, SEARCH_CONFIG
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from django.db.models import BooleanField, Exists, ExpressionWrapper, F, IntegerField, OuterRef, Prefetch, Q
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from http import HTTPStatus
 from rest_framework.decorators import action
+from core.parsers import FastJSONParser
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes
 
+EXPORT_FORMATS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'csv': (export_csv, 'text/csv'),
+}
+
+
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to return, tags and ingredients are returned as IDs'
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR, enum=['tags', 'ingredients', 'tags,ingredients'],
+        description='Comma separated list of relations to return as nested objects'
+    ),
+]
+
 
 @extend_schema_view(
+    retrieve=extend_schema(parameters=SPARSE_FIELDSET_PARAMETERS),
     list=extend_schema(
         parameters=[
             OpenApiParameter(
@@ -23,15 +60,35 @@ from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiPara
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter'
-            )
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full-text search in name and description, results are ranked by relevance'
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Whether recipes need any (default) or all of the given tags and ingredients'
+            ),
+            *SPARSE_FIELDSET_PARAMETERS,
+            OpenApiParameter('min_time', OpenApiTypes.INT, description='Shortest preparation time in minutes'),
+            OpenApiParameter('max_time', OpenApiTypes.INT, description='Longest preparation time in minutes'),
+            OpenApiParameter('min_price', OpenApiTypes.DECIMAL, description='Lowest price'),
+            OpenApiParameter('max_price', OpenApiTypes.DECIMAL, description='Highest price'),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=list(RECIPE_ORDERINGS),
+                description='Sort order, newest first by default or by relevance when searching'
+            ),
         ]
     )
 )
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(CachedListMixin, FastListMixin, ModelViewSet):
     """View: Managing recipe APIs"""
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def _params_to_ints(self, qs):
@@ -40,18 +97,107 @@ class RecipeViewSet(ModelViewSet):
 
     def get_queryset(self):
         """Returning queryset sorted from latest created to newest"""
+        queryset = self.queryset.filter(
+            user=self.request.user
+        ).order_by('-id')
+        # Query parameters narrow the list only, other actions look recipes up by id
+        if self.action == 'list':
+            queryset = self._filter_list(queryset)
+        return self._serializer_queryset(queryset)
+
+    def _filter_list(self, queryset):
+        """Filtering, searching and ordering the recipe list by query parameters"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        queryset = self._filter_ranges(queryset)
+        match_all = self.query_filters['match'] == 'all'
         if tags:
             tags_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tags_ids)
+            if match_all:
+                queryset = queryset.filter(tag_ids__contains=tags_ids)
+            else:
+                queryset = queryset.filter(Exists(
+                    Recipe.tags.through.objects.filter(recipe=OuterRef('pk'), tag__in=tags_ids)
+                ))
         if ingredients:
             ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+            if match_all:
+                queryset = queryset.filter(ingredient_ids__contains=ingredients_ids)
+            else:
+                queryset = queryset.filter(Exists(
+                    Recipe.ingredients.through.objects.filter(recipe=OuterRef('pk'), ingredient__in=ingredients_ids)
+                ))
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = self._search(queryset, search)
+        ordering = self.query_filters.get('ordering')
+        if ordering:
+            self.cursor_ordering = RECIPE_ORDERINGS[ordering]
+            queryset = queryset.order_by(*self.cursor_ordering)
+        return queryset
+
+    def _filter_ranges(self, queryset):
+        """Filtering by validated time and price ranges"""
+        serializer = RecipeFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        self.query_filters = serializer.validated_data
+        lookups = {
+            'min_time': 'time_minutes__gte',
+            'max_time': 'time_minutes__lte',
+            'min_price': 'price__gte',
+            'max_price': 'price__lte',
+        }
+        return queryset.filter(**{
+            lookup: self.query_filters[param] for param, lookup in lookups.items() if param in self.query_filters
+        })
+
+    def _search(self, queryset, search):
+        """Matching recipes against the stored search vector, most relevant first"""
+        query = SearchQuery(search, config=SEARCH_CONFIG, search_type='websearch')
+        # Cursors compare the rank as text, scaling it to an integer keeps it exact
+        rank = Cast(SearchRank(F('search_vector'), query) * 1_000_000, IntegerField())
+        self.cursor_ordering = ('-search_rank', '-id')
+        return queryset.filter(search_vector=query).annotate(search_rank=rank).order_by(*self.cursor_ordering)
+
+    def _serializer_queryset(self, queryset):
+        """Loading only columns and relations rendered by the serializer of the action"""
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        columns, relations = [], []
+        for field in self.get_serializer().fields.values():
+            if field.source in ('tags', 'ingredients'):
+                relations.append(field.source)
+            else:
+                columns.append(field.source)
+        # The paginator reads the ordering field of the first and last row of a page
+        columns += [field.lstrip('-') for field in getattr(self, 'cursor_ordering', ())
+                    if field.lstrip('-') != 'search_rank']
+        related = {'tags': Tag, 'ingredients': Ingredient}
+        return queryset.only(*columns).prefetch_related(*(
+            Prefetch(relation, queryset=related[relation].objects.only('id', 'name').order_by('id'))
+            for relation in relations
+        ))
+
+    def _sparse_fieldset(self):
+        """Fields and expanded relations requested with the fields and expand parameters"""
+        params = self.request.query_params
+        fields = [field.strip() for field in params['fields'].split(',') if field.strip()] if 'fields' in params \
+            else None
+        expand = [field.strip() for field in params.get('expand', '').split(',') if field.strip()]
+        allowed = self.get_serializer_class().Meta.fields
+        unknown = set(fields or ()) - set(allowed)
+        if unknown:
+            raise ValidationError({'fields': [_('Unknown fields: %s.') % ', '.join(sorted(unknown))]})
+        unknown = set(expand) - {'tags', 'ingredients'}
+        if unknown:
+            raise ValidationError({'expand': [_('Unknown relations: %s.') % ', '.join(sorted(unknown))]})
+        return fields, expand
+
+    def get_serializer(self, *args, **kwargs):
+        """Narrowing serializers of read actions to the requested fields"""
+        if self.action in ('list', 'retrieve'):
+            kwargs['fields'], kwargs['expand'] = self._sparse_fieldset()
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         """Specifying serializer for action"""
@@ -59,23 +205,67 @@ class RecipeViewSet(ModelViewSet):
             return RecipeDetailSerializer
         elif self.action == 'upload_image':
             return ImageSerializer
+        elif self.action == 'bulk_import':
+            return RecipeImportSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Serializer saving to db"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['POST'], detail=True, url_path='upload-image', parser_classes=(ImageUploadParser,))
     def upload_image(self, request, pk=None):
         """Uploads an image"""
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            previous_derivatives = recipe.image_derivatives
+            with transaction.atomic():
+                serializer.save(image_derivatives={})
+                transaction.on_commit(lambda: delete_derivatives(previous_derivatives))
+                schedule_derivatives(recipe)
             return Response(serializer.data, HTTPStatus.OK)
         return Response(serializer.errors, status=HTTPStatus.BAD_REQUEST)
 
+    @extend_schema(request=RecipeImportSerializer(many=True), responses=OpenApiTypes.OBJECT)
+    @action(methods=['POST'], detail=False, url_path='bulk-import', parser_classes=(FastJSONParser, JSONLinesParser))
+    def bulk_import(self, request):
+        """Creates recipes from a JSON array or JSON Lines, reporting the result of every row"""
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError({'non_field_errors': [_('Expected a list of recipes.')]})
+        if len(rows) > settings.RECIPE_BULK_IMPORT['MAX_ROWS']:
+            raise ValidationError({'non_field_errors': [
+                _('Import at most %(count)d recipes at once.') % {'count': settings.RECIPE_BULK_IMPORT['MAX_ROWS']}
+            ]})
+
+        report = import_recipes(request.user, rows, self.get_serializer_context())
+        created = sum('id' in row for row in report)
+        return Response({'created': created, 'failed': len(report) - created, 'rows': report}, HTTPStatus.OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR, enum=list(EXPORT_FORMATS),
+                description='Format of the export, ndjson by default'
+            ),
+        ],
+        responses=OpenApiTypes.STR,
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Streams every recipe of the user with tags, ingredients, price and image URL"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': [_('Choose one of: %s.') % ', '.join(EXPORT_FORMATS)]})
+
+        generate, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(generate(request), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="recipes.{export_format}"'
+        return response
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -88,9 +278,10 @@ class RecipeViewSet(ModelViewSet):
         ]
     )
 )
-class AbsoluteViewSet(mixins.UpdateModelMixin, mixins.ListModelMixin, mixins.DestroyModelMixin, GenericViewSet):
+class AbsoluteViewSet(CachedListMixin, FastListMixin, mixins.UpdateModelMixin, mixins.ListModelMixin,
+                      mixins.DestroyModelMixin, GenericViewSet):
     """View: Non duplicating the code below in viewsets"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -100,8 +291,49 @@ class AbsoluteViewSet(mixins.UpdateModelMixin, mixins.ListModelMixin, mixins.Des
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+            model = queryset.model
+            queryset = queryset.filter(Exists(
+                model.recipe_set.through.objects.filter(**{model._meta.model_name: OuterRef('pk')})
+            ))
+        return queryset.filter(user=self.request.user).order_by('-id')
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, description='Beginning of the name, tolerates typos'),
+            OpenApiParameter('limit', OpenApiTypes.INT, description='Number of matches to return'),
+        ]
+    )
+    @action(methods=['GET'], detail=False, url_path='typeahead', pagination_class=None)
+    def typeahead(self, request):
+        """Returns names starting with or similar to q, prefix matches first"""
+        options = settings.TYPEAHEAD
+        term = request.query_params.get('q', '').strip()
+        try:
+            limit = min(int(request.query_params.get('limit', options['LIMIT'])), options['MAX_LIMIT'])
+        except ValueError:
+            raise ValidationError({'limit': [_('A valid integer is required.')]})
+
+        matches = []
+        if term:
+            # Both lookups are served by the trigram index on name
+            prefix = Q(name__iregex='^' + re.escape(term))
+            matches = self.get_queryset().filter(prefix | Q(name__trigram_similar=term)).annotate(
+                is_prefix=ExpressionWrapper(prefix, output_field=BooleanField()),
+                similarity=TrigramSimilarity('name', term),
+            ).order_by('-is_prefix', '-similarity', 'name')[:max(limit, 0)]
+
+        response = Response(self.get_serializer(matches, many=True).data)
+        patch_cache_control(response, private=True, max_age=options['MAX_AGE'])
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def perform_update(self, serializer):
+        """Serializer saving to db, names are unique per user"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': [_('An item with this name already exists.')]})
 
 
 class TagViewSet(AbsoluteViewSet):
@@ -0,0 +1,118 @@
+"""Authentication for the APIs"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import metrics
+
+
+class TTLCache:
+    """Least recently used mapping whose entries expire after ttl seconds"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returning the live value of key or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Storing value and evicting the least recently used entries over max_size"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# User columns kept with a cached token, the password hash and any other column
+# are loaded from the database when a request reads them
+CACHED_USER_FIELDS = ('id', 'email', 'name', 'is_active', 'is_staff', 'is_superuser')
+
+local_tokens = TTLCache(settings.TOKEN_AUTH_CACHE['MAX_SIZE'], settings.TOKEN_AUTH_CACHE['TTL'])
+
+
+def _cache_key(key):
+    """Keeping raw token keys out of cache keys"""
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_tokens():
+    """Returning the cache shared between processes or None when it is not configured"""
+    alias = settings.TOKEN_AUTH_CACHE['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def forget_token(key):
+    """Removing a token from every cache tier"""
+    cache_key = _cache_key(key)
+    local_tokens.delete(cache_key)
+    shared = _shared_tokens()
+    if shared is not None:
+        shared.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Authentication: Token authentication served from memory after the first lookup"""
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        # Entries hold user columns only, each request builds its own instances
+        payload = local_tokens.get(cache_key)
+        if payload is None:
+            shared = _shared_tokens()
+            payload = shared.get(cache_key) if shared is not None else None
+            if payload is None:
+                metrics.CACHE_REQUESTS.inc(cache='token', result='miss')
+                user, token = super().authenticate_credentials(key)
+                payload = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+                if shared is not None:
+                    shared.set(cache_key, payload, settings.TOKEN_AUTH_CACHE['SHARED_TTL'])
+            else:
+                metrics.CACHE_REQUESTS.inc(cache='token', result='shared_hit')
+            local_tokens.set(cache_key, payload)
+        else:
+            metrics.CACHE_REQUESTS.inc(cache='token', result='hit')
+
+        if not payload['is_active']:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        # Columns missing from the payload are deferred. from_db takes the loaded ones in model order
+        user_model = get_user_model()
+        fields = [field.attname for field in user_model._meta.concrete_fields if field.attname in payload]
+        user = user_model.from_db(DEFAULT_DB_ALIAS, fields, [payload[field] for field in fields])
+        token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id'], [key, user.pk])
+        token.user = user
+        return (user, token)
@@ -0,0 +1,16 @@
+"""Password hashers for the user API"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """Hasher: PBKDF2 with the iteration count of PASSWORD_HASHING
+
+    The algorithm name is the one of Django's hasher, which it replaces in
+    PASSWORD_HASHERS. Existing hashes are read by this one and rehashed on
+    login when their iterations differ.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING['PBKDF2_ITERATIONS']
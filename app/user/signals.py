@@ -0,0 +1,22 @@
+"""Signals keeping cached authentication in line with the database"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import forget_token
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Deleted tokens stop authenticating immediately"""
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_changed_user_tokens(sender, instance, created, **kwargs):
+    """Deactivated or edited users are loaded again on their next request"""
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        forget_token(key)
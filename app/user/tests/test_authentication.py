@@ -0,0 +1,164 @@
+"""Tests for the cached token authentication"""
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from http import HTTPStatus
+
+from user.authentication import CachedTokenAuthentication, TTLCache, local_tokens
+
+ME_URL = reverse('user:me')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+SHARED_CACHE_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'tokens': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tokens'},
+    },
+    'TOKEN_AUTH_CACHE': {'MAX_SIZE': 100, 'TTL': 30, 'SHARED_CACHE': 'tokens', 'SHARED_TTL': 300},
+}
+
+
+class TTLCacheTests(SimpleTestCase):
+    """Tests for the in-process LRU cache"""
+
+    def test_expired_entries_are_dropped(self):
+        """Test: Entries older than ttl are not returned"""
+        cache = TTLCache(max_size=10, ttl=5)
+        with patch('user.authentication.time.monotonic', return_value=100):
+            cache.set('key', 'value')
+        with patch('user.authentication.time.monotonic', return_value=104):
+            self.assertEqual(cache.get('key'), 'value')
+        with patch('user.authentication.time.monotonic', return_value=105):
+            self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test: Going over max_size evicts the entry used longest ago"""
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set('first', 1)
+        cache.set('second', 2)
+        cache.get('first')
+        cache.set('third', 3)
+
+        self.assertEqual(cache.get('first'), 1)
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.get('third'), 3)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Tests for authenticating with cached tokens"""
+
+    def setUp(self):
+        local_tokens.clear()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_authenticated_requests_after_first_make_no_auth_queries(self):
+        """Test: Requests with a known token do not query the token table"""
+        # The profile itself is always read from the database
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_error(self):
+        """Test: Unknown tokens are rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_deleted_token_error(self):
+        """Test: Deleting a cached token revokes it"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_deactivated_user_error(self):
+        """Test: Deactivating a user revokes the cached token"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_profile_update_is_visible_on_next_request(self):
+        """Test: Editing the profile replaces the cached user"""
+        self.client.get(ME_URL)
+        res = self.client.patch(ME_URL, {'name': 'NewName'})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'NewName')
+
+    def test_stale_cached_user_not_written_back(self):
+        """Test: Updating the profile with a stale cached user keeps columns changed meanwhile"""
+        self.client.get(ME_URL)
+        # Bulk updates send no signals, like edits made by another process
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False, password=make_password('newpassword123')
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'NewName'})
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'NewName')
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(self.user.check_password('newpassword123'))
+
+    def test_cached_entries_hold_no_secrets(self):
+        """Test: Cache entries hold neither the token key nor the password hash"""
+        self.client.get(ME_URL)
+        entries = [value for value, _ in local_tokens._entries.values()]
+
+        self.assertEqual(len(entries), 1)
+        self.assertNotIn('password', entries[0])
+        self.assertNotIn(self.token.key, entries[0].values())
+        self.assertNotIn(self.token.key, ''.join(local_tokens._entries))
+
+    def test_cached_user_loads_password_on_access(self):
+        """Test: The password of a cached user is read from the database when used"""
+        self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            user, token = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+
+        self.assertEqual((user.email, token.key, token.user), (self.user.email, self.token.key, user))
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('password123'))
+
+    @override_settings(**SHARED_CACHE_SETTINGS)
+    def test_shared_cache_serves_other_processes(self):
+        """Test: A token cached by another process is not looked up again"""
+        self.client.get(ME_URL)
+        local_tokens.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+    @override_settings(**SHARED_CACHE_SETTINGS)
+    def test_shared_cache_forgets_deleted_token(self):
+        """Test: Deleting a token removes it from the shared cache too"""
+        self.client.get(ME_URL)
+        self.token.delete()
+        local_tokens.clear()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, HTTPStatus.UNAUTHORIZED)
@@ -0,0 +1,59 @@
+"""Tests for the configurable password hasher"""
+
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from user.hashers import ConfigurablePBKDF2PasswordHasher
+
+CREATE_TOKEN_URL = reverse('user:token')
+
+
+def iterations(user):
+    """Returning the iterations of the stored password hash of user"""
+    user.refresh_from_db()
+    return int(identify_hasher(user.password).decode(user.password)['iterations'])
+
+
+class ConfigurablePBKDF2PasswordHasherTests(TestCase):
+    """Tests for hashing passwords with the configured cost"""
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['throttle'].clear()
+
+    @override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 1000})
+    def test_new_password_uses_configured_iterations(self):
+        """Test: New passwords are hashed with PASSWORD_HASHING iterations"""
+        user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+
+        self.assertIsInstance(identify_hasher(user.password), ConfigurablePBKDF2PasswordHasher)
+        self.assertEqual(iterations(user), 1000)
+
+    def test_login_upgrades_hash(self):
+        """Test: Logging in rehashes a password stored with other iterations"""
+        with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 1000}):
+            user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+
+        with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 2000}):
+            res = self.client.post(CREATE_TOKEN_URL, {'email': 'user@example.com', 'password': 'password123'})
+
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            self.assertEqual(iterations(user), 2000)
+            self.assertTrue(user.check_password('password123'))
+
+    def test_failed_login_keeps_hash(self):
+        """Test: A wrong password does not rehash the stored password"""
+        with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 1000}):
+            user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+
+        with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 2000}):
+            res = self.client.post(CREATE_TOKEN_URL, {'email': 'user@example.com', 'password': 'wrong-password'})
+
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+            self.assertEqual(iterations(user), 1000)
@@ -0,0 +1,64 @@
+"""Tests for query budgets of the user API"""
+
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.testing import QueryBudgetMixin
+
+CREATE_USER_URL = reverse('user:create')
+CREATE_TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Tests for query budgets of user endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        # Token and sign-up requests of earlier tests are not held against this one
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+
+    def create_recipes(self, count):
+        """Creating count recipes of the user"""
+        Recipe.objects.bulk_create(Recipe(user=self.user, name=f'Curry {i}', time_minutes=10) for i in range(count))
+
+    def create_users(self, count):
+        """Creating count other users"""
+        get_user_model().objects.bulk_create(
+            get_user_model()(email=f'other-{i}@example.com') for i in range(count)
+        )
+
+    def request(self, method, url, data=None, status=HTTPStatus.OK):
+        res = getattr(self.client, method)(url, data)
+        self.assertEqual(res.status_code, status, res.data)
+        return res
+
+    def test_create_budget(self):
+        """Test: Creating a user runs a fixed number of queries"""
+        payload = {'email': 'new@example.com', 'password': 'password123', 'name': 'New'}
+        self.assertQueriesScale(
+            self.create_users, lambda _: self.request('post', CREATE_USER_URL, payload, HTTPStatus.CREATED), budget=2
+        )
+
+    def test_token_budget(self):
+        """Test: Generating a token runs a fixed number of queries"""
+        payload = {'email': 'user@example.com', 'password': 'password123'}
+        self.assertQueriesScale(
+            self.create_recipes, lambda _: self.request('post', CREATE_TOKEN_URL, payload), budget=5
+        )
+
+    def test_me_budget(self):
+        """Test: Reading and updating the profile runs a fixed number of queries"""
+        self.client.force_authenticate(self.user)
+        for method, data, budget in (('get', None, 1), ('patch', {'name': 'Renamed'}, 3)):
+            with self.subTest(method=method):
+                self.assertQueriesScale(
+                    self.create_recipes, lambda _: self.request(method, ME_URL, data), budget=budget
+                )
@@ -0,0 +1,117 @@
+"""Tests for the token bucket throttling of the user API"""
+
+import base64
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+
+CREATE_USER_URL = reverse('user:create')
+CREATE_TOKEN_URL = reverse('user:token')
+
+BUCKETS = {
+    'ENABLED': True,
+    'CACHE': 'throttle',
+    'SCOPES': {
+        'user:token': {'CAPACITY': 2, 'RATE': 0.5},
+        'user:create': {'CAPACITY': 1, 'RATE': 0.1},
+    },
+}
+
+
+@override_settings(USER_THROTTLE=BUCKETS)
+class TokenBucketThrottleTests(TestCase):
+    """Tests for rejecting bursts of token and sign-up requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['throttle'].clear()
+        metrics.clear()
+        self.credentials = {'email': 'user@example.com', 'password': 'password123'}
+
+    def test_burst_over_capacity_rejected(self):
+        """Test: Requests over the bucket capacity return 429 with Retry-After"""
+        for _ in range(2):
+            res = self.client.post(CREATE_TOKEN_URL, self.credentials)
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+        res = self.client.post(CREATE_TOKEN_URL, self.credentials)
+
+        self.assertEqual(res.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '2')
+        self.assertEqual(metrics.THROTTLED_REQUESTS.values[('user:token',)], 1)
+
+    def test_rejected_before_hashing(self):
+        """Test: A throttled request does not authenticate or query the database"""
+        self.client.post(CREATE_TOKEN_URL, self.credentials)
+        self.client.post(CREATE_TOKEN_URL, self.credentials)
+
+        with patch('user.serializers.authenticate') as authenticate, self.assertNumQueries(0):
+            res = self.client.post(CREATE_TOKEN_URL, self.credentials)
+
+        self.assertEqual(res.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        authenticate.assert_not_called()
+
+    def test_basic_authentication_not_hashed_before_throttle(self):
+        """Test: Basic credentials are neither checked nor exempt from the throttle"""
+        header = 'Basic ' + base64.b64encode(b'user@example.com:wrong-password').decode()
+        with patch('rest_framework.authentication.authenticate') as authenticate:
+            codes = [self.client.post(CREATE_TOKEN_URL, HTTP_AUTHORIZATION=header).status_code for _ in range(3)]
+            self.client.post(CREATE_USER_URL, HTTP_AUTHORIZATION=header)
+            res = self.client.post(CREATE_USER_URL, HTTP_AUTHORIZATION=header)
+
+        self.assertEqual(codes, [HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST, HTTPStatus.TOO_MANY_REQUESTS])
+        self.assertEqual(res.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        authenticate.assert_not_called()
+
+    def test_forwarded_for_not_trusted(self):
+        """Test: Changing X-Forwarded-For does not give a client a new bucket"""
+        for number in range(2):
+            self.client.post(CREATE_TOKEN_URL, self.credentials, HTTP_X_FORWARDED_FOR=f'10.0.0.{number}')
+
+        res = self.client.post(CREATE_TOKEN_URL, self.credentials, HTTP_X_FORWARDED_FOR='10.0.0.9')
+
+        self.assertEqual(res.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_forwarded_for_of_trusted_proxy(self):
+        """Test: Behind a trusted proxy clients are told apart by the address it forwards"""
+        for number in range(3):
+            res = self.client.post(CREATE_TOKEN_URL, self.credentials, HTTP_X_FORWARDED_FOR=f'10.0.0.{number}')
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_bucket_refills(self):
+        """Test: Tokens come back at the configured rate"""
+        with patch('user.throttling.time.monotonic', return_value=100.0):
+            self.client.post(CREATE_TOKEN_URL, self.credentials)
+            self.client.post(CREATE_TOKEN_URL, self.credentials)
+            res = self.client.post(CREATE_TOKEN_URL, self.credentials)
+            self.assertEqual(res.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+
+        with patch('user.throttling.time.monotonic', return_value=102.0):
+            res = self.client.post(CREATE_TOKEN_URL, self.credentials)
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_scopes_and_clients_separate(self):
+        """Test: Scopes and client addresses have their own buckets"""
+        payload = {**self.credentials, 'name': 'Name'}
+        self.assertEqual(self.client.post(CREATE_USER_URL, payload).status_code, HTTPStatus.CREATED)
+        self.assertEqual(self.client.post(CREATE_USER_URL, payload).status_code, HTTPStatus.TOO_MANY_REQUESTS)
+
+        res = self.client.post(CREATE_USER_URL, payload, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        res = self.client.post(CREATE_TOKEN_URL, self.credentials)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+    def test_disabled(self):
+        """Test: Throttling can be switched off"""
+        with override_settings(USER_THROTTLE={**settings.USER_THROTTLE, 'ENABLED': False}):
+            for _ in range(3):
+                res = self.client.post(CREATE_TOKEN_URL, self.credentials)
+                self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
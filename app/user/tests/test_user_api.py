@@ -1,5 +1,6 @@
 """Tests for the user API"""
 
+from django.core.cache import caches
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -25,6 +26,8 @@ class PublicUserApiTests(TestCase):
     def setUp(self):
         """Preparing client"""
         self.client = APIClient()
+        # Token and sign-up requests of earlier tests are not held against this one
+        caches['throttle'].clear()
 
         self.payload = {
             'email': 'user@example.com',
@@ -0,0 +1,43 @@
+"""Throttling for the user API"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from core import metrics
+
+# Taking a token is a read and a write, serialized within the process that
+# owns the local cache
+_lock = threading.Lock()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle: Token bucket per client address for the view's throttle_scope"""
+
+    def allow_request(self, request, view):
+        options = settings.USER_THROTTLE
+        bucket = options['SCOPES'].get(getattr(view, 'throttle_scope', None))
+        if not options['ENABLED'] or bucket is None:
+            return True
+
+        capacity, rate = bucket['CAPACITY'], bucket['RATE']
+        cache = caches[options['CACHE']]
+        key = f'throttle:{view.throttle_scope}:{self.get_ident(request)}'
+        with _lock:
+            now = time.monotonic()
+            tokens, updated_at = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # A bucket left alone until it is full again is the same as no bucket
+            cache.set(key, (tokens, now), (capacity - tokens) / rate + 1 if rate else None)
+        if not allowed:
+            metrics.THROTTLED_REQUESTS.inc(scope=view.throttle_scope)
+        self.retry_after = None if allowed else ((1 - tokens) / rate if rate else None)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
@@ -1,28 +1,39 @@
 """Views for the user API"""
+from django.contrib.auth import get_user_model
 from rest_framework.generics import CreateAPIView, RetrieveUpdateAPIView
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
-from rest_framework import authentication, permissions
+from rest_framework import permissions
 from user.serializers import UserCreateSerializer, TokenGenerateSerializer
+from user.authentication import CachedTokenAuthentication
+from user.throttling import TokenBucketThrottle
 
 
 class UserCreateView(CreateAPIView):
     """View: Creating user with a serializer"""
     serializer_class = UserCreateSerializer
+    # DRF authenticates before throttling, Basic credentials would be hashed before the throttle
+    authentication_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'user:create'
 
 
 class TokenGenerateView(ObtainAuthToken):
     """View: Generating token"""
     serializer_class = TokenGenerateSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # DRF authenticates before throttling, Basic credentials would be hashed before the throttle
+    authentication_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'user:token'
 
 
 class UserPersonalView(RetrieveUpdateAPIView):
     """View: Updating user credentials"""
     serializer_class = UserCreateSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Returning authenticated user"""
-        return self.request.user
+        """Returning authenticated user as stored now, the cached one may be stale"""
+        return get_user_model().objects.get(pk=self.request.user.pk)